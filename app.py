@@ -1,17 +1,20 @@
 import streamlit as st
 import pandas as pd
-import asyncio
+import numpy as np
 import os
 import tempfile
-from telethon import TelegramClient
-from telethon.tl.functions.contacts import ImportContactsRequest
-from telethon.tl.types import InputPhoneContact
-from telethon.errors import SessionPasswordNeededError, FloodWaitError
-import time
-import nest_asyncio
-
-# Apply nest_asyncio to allow nested event loops
-nest_asyncio.apply()
+from telethon.errors import SessionPasswordNeededError
+from tg_checker import cache, metrics, runner, sessions
+from tg_checker.ingest import FILE_TYPES, list_columns, list_sheets, preview
+from tg_checker.dedup import dedup_numbers, join_results
+from tg_checker.export import FORMATS, export_bytes, file_name, format_label, mime_type
+from tg_checker.journal import JobJournal, job_id_for
+from tg_checker.lookup import find_users
+from tg_checker.normalize import COUNTRIES, DEFAULT_COUNTRY, unpack_numbers
+from tg_checker.parallel import Part, part_label, read_parts, read_parts_frame
+from tg_checker.results import PAGE_SIZE, ResultTable
+from tg_checker.settings import RESULT_TTL_DAYS
+from tg_checker.store import get_store
 
 # Set page config
 st.set_page_config(
@@ -20,6 +23,9 @@ st.set_page_config(
     layout="wide"
 )
 
+# Prometheus metrics on a local port, started once per process
+metrics.serve()
+
 st.title("📱 Telegram User Finder")
 st.markdown("Find which phone numbers from your Excel file have Telegram accounts")
 
@@ -29,41 +35,127 @@ if 'client' not in st.session_state:
 if 'authenticated' not in st.session_state:
     st.session_state.authenticated = False
 if 'phone_numbers' not in st.session_state:
-    st.session_state.phone_numbers = []
-if 'found_users' not in st.session_state:
-    st.session_state.found_users = []
-if 'event_loop' not in st.session_state:
-    st.session_state.event_loop = None
+    st.session_state.phone_numbers = np.empty(0, dtype=np.int64)
+if 'results' not in st.session_state:
+    st.session_state.results = None
 if 'auth_step' not in st.session_state:
     st.session_state.auth_step = 'start'  # start, code_sent, password_needed, authenticated
 
-def get_or_create_event_loop():
-    """Get the current event loop or create a new one"""
-    if st.session_state.event_loop is None:
+def run_async(coro):
+    """Run a coroutine on the shared background event loop and wait for its result"""
+    return runner.get_runtime().run(coro)
+
+def operator_key(phone):
+    """The operator's phone digits; lookup jobs and journals are kept apart per operator"""
+    try:
+        return sessions.session_key(phone)
+    except ValueError:
+        return ''
+
+def show_timing(stats):
+    """One-line split of a run's time between working and waiting"""
+    if stats:
+        waiting = stats['pacing_seconds'] + stats['flood_wait_seconds'] + stats['backoff_seconds']
+        st.caption(
+            f"⏱️ Working {stats['work_seconds']:.0f}s · waiting {waiting:.0f}s "
+            f"(pacing {stats['pacing_seconds']:.0f}s, flood waits {stats['flood_wait_seconds']:.0f}s, "
+            f"backoff {stats['backoff_seconds']:.0f}s) · {stats['retries']} retries, "
+            f"{stats['failed_batches']} batches given up · cleanup removed {stats['contacts_deleted']} "
+            f"contacts in {stats['cleanup_seconds']:.0f}s"
+        )
+
+@st.fragment(run_every=1)
+def show_job_progress(job_id):
+    """Live progress and controls for a running lookup job, polled every second"""
+    job = runner.get_job(job_id)
+    snapshot = job.snapshot()
+    if snapshot['state'] in runner.FINAL_STATES:
+        # Rerun the whole page so the results section picks up the final state
+        st.rerun()
+    
+    total_batches = snapshot['total_batches']
+    st.progress(min(snapshot['done_batches'] / total_batches, 1.0) if total_batches else 0.0)
+    st.text(snapshot['status'])
+    show_timing(snapshot['stats'])
+    for level, text in snapshot['messages'][-5:]:
+        getattr(st, level)(text)
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        if snapshot['state'] == runner.PAUSED:
+            if st.button("▶️ Resume"):
+                job.resume()
+        elif st.button("⏸️ Pause"):
+            job.pause()
+    with col2:
+        if st.button("⏹️ Cancel"):
+            job.cancel()
+    
+    # Show the latest results; the job keeps only a bounded tail of them
+    if snapshot['found_count']:
+        st.success(f"Found {snapshot['found_count']} users so far")
+        for user in snapshot['tail']:
+            username_display = f"@{user['username']}" if user['username'] else "No username"
+            st.text(f"👤 {user['first_name']} {user['last_name']} — {username_display} — {user['phone']}")
+
+def export_download(label, key, build, kind, stem):
+    """Download button for a file that is generated only on request and then cached under ``key``"""
+    data = cache.exports.get(key)
+    if data is None:
+        if not st.button(f"⚙️ Prepare {label}", key=f"prepare_{stem}_{kind}"):
+            return
         try:
-            loop = asyncio.get_event_loop()
-            if loop.is_closed():
-                raise RuntimeError("Event loop is closed")
-        except RuntimeError:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-        st.session_state.event_loop = loop
-    return st.session_state.event_loop
+            with st.spinner(f"Preparing {label}..."):
+                data = cache.exports.put(key, export_bytes(build(), kind))
+        except Exception as e:
+            st.error(f"❌ Error preparing {label}: {str(e)}")
+            return
+    st.download_button(
+        label=f"📥 Download {label} ({format_label(kind)})",
+        data=data,
+        file_name=file_name(stem, kind),
+        mime=mime_type(kind),
+        key=f"download_{stem}_{kind}"
+    )
+
+def show_metrics():
+    """Process-wide performance summary: where lookup and parse time goes"""
+    summary = metrics.summary()
+    with st.expander("📈 Performance"):
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Numbers / second", f"{summary['numbers_per_second']:.2f}")
+        col2.metric("Mean RPC latency", f"{summary['rpc_mean_seconds'] * 1000:.0f} ms")
+        col3.metric("Flood waits", summary['flood_waits'], f"{summary['flood_wait_seconds']:.0f}s waited",
+                    delta_color="off")
+        hit_rate = summary['store_hit_rate']
+        col4.metric("Store hit rate", "—" if hit_rate is None else f"{hit_rate * 100:.1f}%")
+        st.caption(
+            f"{summary['batches']} batches, {summary['numbers']} numbers looked up · "
+            f"pacing {summary['pacing_seconds']:.0f}s, backoff {summary['backoff_seconds']:.0f}s · "
+            f"mean parse {summary['parse_mean_seconds']:.2f}s for {summary['parse_rows']} rows read"
+        )
+        if metrics.METRICS_PORT:
+            st.caption(f"Prometheus metrics: http://127.0.0.1:{metrics.METRICS_PORT}/metrics")
 
 # Helper function to clean phone numbers
-def clean_phone_numbers(df, column_name):
-    """Extract and clean mobile numbers, convert to +91 format"""
+def clean_phone_numbers(parts, part_keys, column_name, default_country=DEFAULT_COUNTRY, country_column=None):
+    """Normalize mobile numbers to E.164 across every file and sheet, dropping invalid rows"""
+    progress_text = st.empty()
+    
+    def show_progress(done, total, rows_read):
+        progress_text.text(f"Parsing... {done}/{total} files and sheets done, {rows_read} rows read")
+    
     try:
-        raw_numbers = df[column_name].astype(str)
-        phone_numbers = []
-        for num in raw_numbers:
-            digits_only = ''.join(filter(str.isdigit, num))
-            if len(digits_only) >= 10:
-                phone_numbers.append('+91' + digits_only[-10:])
-        return phone_numbers
+        key = ('normalized', part_keys, column_name, default_country, country_column)
+        return cache.uploads.get_or_compute(
+            key,
+            lambda: read_parts(parts, column_name, default_country, country_column, on_part=show_progress)
+        )
     except Exception as e:
         st.error(f"Error processing phone numbers: {str(e)}")
-        return []
+        return 0, None
+    finally:
+        progress_text.empty()
 
 # Step 1: API Configuration
 st.header("1. 🔐 API Configuration")
@@ -76,40 +168,116 @@ with col1:
 with col2:
     api_hash = st.text_input("API Hash", type="password", help="Your Telegram API Hash")
 
+# A running job uses this operator's client, so it must not be disconnected under it
+owner = operator_key(phone_number)
+
 # Step 2: File Upload
 st.header("2. 📁 Upload Excel File")
-uploaded_file = st.file_uploader(
-    "Choose your Excel file containing phone numbers",
-    type=['xlsx', 'xls'],
-    help="Excel file should contain a column with mobile numbers"
+uploaded_files = st.file_uploader(
+    "Choose your Excel, CSV or Parquet files containing phone numbers",
+    type=FILE_TYPES,
+    accept_multiple_files=True,
+    help="Each file should contain a column with mobile numbers; workbooks can have several sheets"
 )
+parts, part_keys = [], ()
 
-if uploaded_file is not None:
+if uploaded_files:
     try:
-        df = pd.read_excel(uploaded_file)
-        st.success(f"✅ File uploaded successfully! Found {len(df)} rows")
+        # Only headers and a few rows are read here; the number column is parsed below
+        # Parsed results are cached by file content, so reruns skip the parse entirely
+        all_parts, all_keys = [], []
+        for upload in uploaded_files:
+            file_key = cache.upload_key(upload)
+            for sheet in cache.uploads.get_or_compute(('sheets', file_key), lambda: list_sheets(upload)):
+                all_parts.append(Part(upload, sheet))
+                all_keys.append((file_key, sheet))
+        
+        # Every sheet of every file is used unless deselected
+        chosen = list(range(len(all_parts)))
+        if len(all_parts) > 1:
+            chosen = st.multiselect(
+                "Files and sheets to include:",
+                chosen,
+                default=chosen,
+                format_func=lambda i: part_label(all_parts[i]),
+                help="They are parsed in parallel and their numbers merged into one list"
+            )
+        if not chosen:
+            st.warning("⚠️ Select at least one file or sheet")
+        
+        part_columns = [
+            cache.uploads.get_or_compute(('columns',) + all_keys[i], lambda: list_columns(all_parts[i].source, all_parts[i].sheet))
+            for i in chosen
+        ]
+        columns = list(dict.fromkeys(column for names in part_columns for column in names))
         
         # Show preview
-        st.subheader("Preview of uploaded data:")
-        st.dataframe(df.head())
+        if chosen:
+            st.subheader("Preview of uploaded data:")
+            tabs = st.tabs([part_label(all_parts[i]) for i in chosen]) if len(chosen) > 1 else [st.container()]
+            for tab, i in zip(tabs, chosen):
+                with tab:
+                    st.dataframe(cache.uploads.get_or_compute(
+                        ('preview',) + all_keys[i], lambda: preview(all_parts[i].source, sheet=all_parts[i].sheet)
+                    ))
         
         # Column selection
-        columns = df.columns.tolist()
         selected_column = st.selectbox(
             "Select the column containing mobile numbers:",
             columns,
             help="Choose which column contains the phone numbers"
         )
         
+        col1, col2 = st.columns(2)
+        with col1:
+            default_country = st.selectbox(
+                "Default country:",
+                list(COUNTRIES),
+                index=list(COUNTRIES).index(DEFAULT_COUNTRY),
+                help="Used for numbers written without a country code"
+            )
+        with col2:
+            country_column = st.selectbox(
+                "Country column (optional):",
+                [None] + columns,
+                format_func=lambda c: "None" if c is None else c,
+                help="Column with a per-row ISO code (IN) or calling code (+91)"
+            )
+        
         if selected_column:
+            # Files and sheets without the selected columns are left out
+            needed = [c for c in (selected_column, country_column) if c]
+            with_column = [i for i, names in zip(chosen, part_columns) if all(c in names for c in needed)]
+            skipped = [part_label(all_parts[i]) for i in chosen if i not in with_column]
+            if skipped:
+                st.warning(f"⚠️ Skipped, no {' or '.join(repr(c) for c in needed)} column: {', '.join(skipped)}")
+            parts = [all_parts[i] for i in with_column]
+            part_keys = tuple(all_keys[i] for i in with_column)
+        
+        if parts:
             # Process phone numbers
-            st.session_state.phone_numbers = clean_phone_numbers(df, selected_column)
-            st.info(f"📱 Processed {len(st.session_state.phone_numbers)} valid phone numbers")
+            total_rows, normalized = clean_phone_numbers(parts, part_keys, selected_column, default_country, country_column)
+            numbers_key = (part_keys, selected_column, default_country, country_column)
+            if st.session_state.get('numbers_key') != numbers_key:
+                # Look up each number once, even when it appears in several files or sheets
+                # Numbers arrive packed as int64; number_rows maps (part, row) back to them
+                st.session_state.phone_numbers = (
+                    dedup_numbers(normalized.numbers).unique if normalized else np.empty(0, dtype=np.int64)
+                )
+                st.session_state.number_rows = normalized.numbers if normalized else None
+                st.session_state.numbers_key = numbers_key if normalized else None
+            sources = f" from {len(parts)} files and sheets" if len(parts) > 1 else ""
+            st.success(f"✅ File uploaded successfully! Found {total_rows} rows{sources}")
+            st.info(f"📱 Processed {len(normalized.numbers) if normalized else 0} valid phone numbers "
+                    f"({len(st.session_state.phone_numbers)} unique)")
+            if normalized and any(normalized.rejected.values()):
+                rejected = ", ".join(f"{reason}: {count}" for reason, count in normalized.rejected.items() if count)
+                st.warning(f"⚠️ Skipped {sum(normalized.rejected.values())} invalid rows ({rejected})")
             
             # Show sample of processed numbers
-            if st.session_state.phone_numbers:
+            if len(st.session_state.phone_numbers):
                 with st.expander("View processed phone numbers (first 10)"):
-                    for i, num in enumerate(st.session_state.phone_numbers[:10]):
+                    for i, num in enumerate(unpack_numbers(st.session_state.phone_numbers[:10]).to_pylist()):
                         st.text(f"{i+1}. {num}")
                     if len(st.session_state.phone_numbers) > 10:
                         st.text(f"... and {len(st.session_state.phone_numbers) - 10} more")
@@ -118,31 +286,47 @@ if uploaded_file is not None:
         st.error(f"❌ Error reading file: {str(e)}")
 
 # Step 3: Authentication
-if api_id and api_hash and phone_number and st.session_state.phone_numbers:
+if api_id and api_hash and phone_number and len(st.session_state.phone_numbers):
     st.header("3. 🔒 Telegram Authentication")
     
+    # Reconnect with a stored session once per operator, skipping the code step
+    operator = (phone_number, api_id, api_hash)
+    if (st.session_state.auth_step == 'start' and st.session_state.get('resumed_operator') != operator
+            and sessions.has_session(phone_number)):
+        st.session_state.resumed_operator = operator
+        try:
+            # The saved session only opens with the API credentials it was authorized with
+            if not sessions.credentials_match(phone_number, int(api_id), api_hash):
+                st.warning("⚠️ The saved session for this phone can't be used with these API credentials. "
+                           "Log in with a code to replace it.")
+            else:
+                with st.spinner("Reconnecting with your saved session..."):
+                    client = sessions.get_client(phone_number, int(api_id), api_hash)
+                    if run_async(sessions.connect(client)):
+                        sessions.save(phone_number, client, int(api_id), api_hash)
+                        st.session_state.client = client
+                        st.session_state.authenticated = True
+                        st.session_state.auth_step = 'authenticated'
+        except Exception as e:
+            st.warning(f"⚠️ Could not reuse the saved session: {str(e)}")
+    
     if st.session_state.auth_step == 'start':
         if st.button("🚀 Start Authentication", type="primary"):
             try:
-                # Create session file in temp directory
-                session_name = f"session_{int(time.time())}"
-                
-                # Initialize client
-                st.session_state.client = TelegramClient(session_name, int(api_id), api_hash)
+                # The shared client when these credentials match the saved session, else a fresh login
+                st.session_state.client = sessions.get_client(phone_number, int(api_id), api_hash)
                 
                 with st.spinner("Connecting to Telegram..."):
                     async def start_auth():
-                        await st.session_state.client.connect()
-                        if not await st.session_state.client.is_user_authorized():
+                        if not await sessions.connect(st.session_state.client):
                             await st.session_state.client.send_code_request(phone_number)
                             return False
                         return True
                     
-                    # Use consistent event loop
-                    loop = get_or_create_event_loop()
-                    is_authorized = loop.run_until_complete(start_auth())
+                    is_authorized = run_async(start_auth())
                     
                     if is_authorized:
+                        sessions.save(phone_number, st.session_state.client, int(api_id), api_hash)
                         st.session_state.authenticated = True
                         st.session_state.auth_step = 'authenticated'
                         st.success("✅ Already authenticated!")
@@ -175,11 +359,10 @@ if api_id and api_hash and phone_number and st.session_state.phone_numbers:
                             except Exception as e:
                                 return False, str(e)
                         
-                        # Use same event loop
-                        loop = get_or_create_event_loop()
-                        success, error = loop.run_until_complete(verify_code())
+                        success, error = run_async(verify_code())
                         
                         if success:
+                            sessions.save(phone_number, st.session_state.client, int(api_id), api_hash)
                             st.session_state.authenticated = True
                             st.session_state.auth_step = 'authenticated'
                             st.success("✅ Successfully authenticated!")
@@ -200,8 +383,7 @@ if api_id and api_hash and phone_number and st.session_state.phone_numbers:
                     async def resend_code():
                         await st.session_state.client.send_code_request(phone_number)
                     
-                    loop = get_or_create_event_loop()
-                    loop.run_until_complete(resend_code())
+                    run_async(resend_code())
                     st.success("📱 New verification code sent!")
                 except Exception as e:
                     st.error(f"❌ Error resending code: {str(e)}")
@@ -217,9 +399,8 @@ if api_id and api_hash and phone_number and st.session_state.phone_numbers:
                     async def verify_password():
                         await st.session_state.client.sign_in(password=password)
                     
-                    # Use same event loop
-                    loop = get_or_create_event_loop()
-                    loop.run_until_complete(verify_password())
+                    run_async(verify_password())
+                    sessions.save(phone_number, st.session_state.client, int(api_id), api_hash)
                     st.session_state.authenticated = True
                     st.session_state.auth_step = 'authenticated'
                     st.success("✅ Successfully authenticated with 2FA!")
@@ -230,22 +411,21 @@ if api_id and api_hash and phone_number and st.session_state.phone_numbers:
     
     elif st.session_state.auth_step == 'authenticated':
         st.success("✅ Successfully authenticated with Telegram!")
-        if st.button("🔄 Reset Authentication"):
+        busy = runner.active_job(owner) is not None
+        if st.button("🔄 Reset Authentication", disabled=busy, help="Cancel the running search first" if busy else None):
             st.session_state.auth_step = 'start'
             st.session_state.authenticated = False
             if st.session_state.client:
                 try:
-                    async def disconnect():
-                        await st.session_state.client.disconnect()
-                    loop = get_or_create_event_loop()
-                    loop.run_until_complete(disconnect())
+                    # Drop the stored session too, so the next start asks for a new code
+                    sessions.forget(phone_number, st.session_state.client)
                 except:
                     pass
                 st.session_state.client = None
             st.rerun()
 
 # Step 4: Find Telegram Users
-if st.session_state.authenticated and st.session_state.phone_numbers:
+if st.session_state.authenticated and len(st.session_state.phone_numbers):
     st.header("4. 🔍 Find Telegram Users")
     
     # Batch size setting
@@ -253,146 +433,157 @@ if st.session_state.authenticated and st.session_state.phone_numbers:
                           help="Number of contacts to process at once")
     
     delay = st.slider("Delay between batches (seconds)", min_value=30, max_value=300, value=211,
-                     help="Delay to avoid rate limiting")
+                     help="Minimum time from the start of one batch to the start of the next. "
+                          "A rate limit reported by Telegram holds the next batch until it expires, "
+                          "if that is later.")
     
-    if st.button("🔍 Start Finding Users", type="primary"):
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-        results_container = st.empty()
+    ttl_days = st.number_input("Reuse results checked within (days)", min_value=0, value=int(RESULT_TTL_DAYS),
+                               help="Numbers checked more recently than this are answered from the local result store")
+    cleanup = st.checkbox("Remove imported contacts after each batch", value=True,
+                          help="Deletes the placeholder contacts this run adds to your account. "
+                               "Contacts you already had are left alone.")
+    
+    # Each run is journaled on disk, so a refresh or restart can pick up where it stopped
+    # Jobs are per operator: the same list checked from another account is a separate job
+    st.session_state.job_id = cache.uploads.get_or_compute(
+        ('job_id', st.session_state.numbers_key, owner),
+        lambda: job_id_for(st.session_state.phone_numbers, owner)
+    )
+    journal = JobJournal(st.session_state.job_id)
+    # Results are read incrementally: each rerun only parses batches journaled since the last one
+    if st.session_state.results is None or st.session_state.results.job_id != journal.job_id:
+        st.session_state.results = ResultTable(journal.job_id)
+    st.session_state.results.sync(journal)
+    
+    # The hit count only changes when new results come in, so it is counted once per journal version
+    store = get_store(ttl_days)
+    cached = cache.uploads.get_or_compute(
+        ('store_hits', journal.job_id, ttl_days, st.session_state.results.offset),
+        lambda: store.count_fresh(unpack_numbers(st.session_state.phone_numbers).to_pylist())
+    )
+    hit_rate = cached / len(st.session_state.phone_numbers) * 100
+    st.info(f"♻️ {cached} of {len(st.session_state.phone_numbers)} numbers already checked ({hit_rate:.1f}% hit rate), "
+            f"{len(st.session_state.phone_numbers) - cached} left to query")
+    
+    # Jobs run on the background runtime; this page only polls their progress
+    job = runner.get_job(journal.job_id)
+    if job is not None and job.is_active():
+        show_job_progress(journal.job_id)
+    else:
+        if job is not None:
+            snapshot = job.snapshot()
+            if snapshot['state'] == runner.DONE:
+                st.success("✅ Search completed!")
+            elif snapshot['state'] == runner.CANCELLED:
+                st.warning("⏹️ Search cancelled. Progress is saved; start again to resume.")
+            show_timing(snapshot['stats'])
+            for level, text in snapshot['messages'][-5:]:
+                getattr(st, level)(text)
         
-        st.session_state.found_users = []
-        total_batches = (len(st.session_state.phone_numbers) + batch_size - 1) // batch_size
+        start_over, done_batches = False, 0
+        if journal.exists() and not journal.is_finished():
+            done_batches, journal_batches = journal.progress()
+            st.info(f"⏯️ An interrupted run of this list was found ({done_batches}/{journal_batches} batches done). "
+                    f"Starting will resume it with its original batch size of {journal.meta['batch_size']}.")
+            start_over = st.checkbox("Start over instead of resuming")
         
-        try:
-            async def find_users():
-                for i in range(0, len(st.session_state.phone_numbers), batch_size):
-                    batch_num = i // batch_size + 1
-                    batch = st.session_state.phone_numbers[i:i+batch_size]
-                    
-                    status_text.text(f"Processing batch {batch_num}/{total_batches}...")
-                    
-                    contacts = [
-                        InputPhoneContact(client_id=j, phone=number, first_name='A', last_name='')
-                        for j, number in enumerate(batch)
-                    ]
-                    
-                    try:
-                        result = await st.session_state.client(ImportContactsRequest(contacts))
-                        
-                        batch_users = []
-                        for user in result.users:
-                            user_info = {
-                                'first_name': user.first_name or '',
-                                'last_name': user.last_name or '',
-                                'username': user.username or '',
-                                'phone': user.phone or ''
-                            }
-                            batch_users.append(user_info)
-                            st.session_state.found_users.append(user_info)
-                        
-                        # Update progress
-                        progress = min(batch_num / total_batches, 1.0)
-                        progress_bar.progress(progress)
-                        
-                        # Show batch results
-                        with results_container.container():
-                            if batch_users:
-                                st.success(f"Batch {batch_num}: Found {len(batch_users)} users")
-                                for user in batch_users:
-                                    username_display = f"@{user['username']}" if user['username'] else "No username"
-                                    st.text(f"👤 {user['first_name']} {user['last_name']} — {username_display} — {user['phone']}")
-                            else:
-                                st.info(f"Batch {batch_num}: No users found")
-                        
-                        # Delay between batches (except for the last batch)
-                        if batch_num < total_batches:
-                            for remaining in range(delay, 0, -1):
-                                status_text.text(f"Waiting {remaining} seconds before next batch...")
-                                await asyncio.sleep(1)
-                    
-                    except FloodWaitError as e:
-                        st.warning(f"Rate limit hit. Waiting {e.seconds} seconds...")
-                        await asyncio.sleep(e.seconds)
-                    except Exception as e:
-                        st.error(f"Error in batch {batch_num}: {str(e)}")
-            
-            # Run the search
-            loop = get_or_create_event_loop()
-            loop.run_until_complete(find_users())
+        if st.button("🔍 Start Finding Users", type="primary"):
+            if start_over or journal.is_finished():
+                journal.discard()
+                done_batches = 0
+            client = st.session_state.client
+            numbers = unpack_numbers(st.session_state.phone_numbers).to_pylist()
             
-            status_text.text("✅ Search completed!")
-            progress_bar.progress(1.0)
+            async def lookup(job):
+                # The shared client may have been disconnected from another browser session
+                if not await sessions.connect(client):
+                    raise RuntimeError("The Telegram session is no longer authorized; authenticate again")
+                return await find_users(
+                    client, numbers, batch_size, delay, store, journal,
+                    on_batch=job.on_batch, on_wait=job.on_wait, on_error=job.on_error,
+                    checkpoint=job.checkpoint, on_stats=job.on_stats, on_cleanup=job.on_cleanup,
+                    cleanup=cleanup
+                )
             
-        except Exception as e:
-            st.error(f"❌ Error during search: {str(e)}")
+            runner.start_job(journal.job_id, lookup, owner=owner, done_batches=done_batches)
+            st.rerun()
+    
+    show_metrics()
 
 # Step 5: Results and Download
-if st.session_state.found_users:
+results = st.session_state.results
+if results is not None and len(results):
     st.header("5. 📊 Results")
     
-    st.success(f"✅ Found {len(st.session_state.found_users)} Telegram users out of {len(st.session_state.phone_numbers)} phone numbers")
+    st.success(f"✅ Found {len(results)} Telegram users out of {len(st.session_state.phone_numbers)} phone numbers")
     
     # Display results in a nice format
     col1, col2 = st.columns([2, 1])
     
     with col1:
         st.subheader("Found Users:")
-        results_df = pd.DataFrame(st.session_state.found_users)
-        st.dataframe(results_df, use_container_width=True)
+        # Only the page on screen is converted from the columnar store
+        page_col, size_col = st.columns(2)
+        with size_col:
+            page_size = st.selectbox("Rows per page", [PAGE_SIZE, 500, 1000], key="page_size")
+        with page_col:
+            page = st.number_input(f"Page (of {results.page_count(page_size)})", min_value=1,
+                                   max_value=results.page_count(page_size), value=1, key="results_page")
+        st.dataframe(results.page(page - 1, page_size), use_container_width=True)
     
     with col2:
         st.subheader("Statistics:")
         st.metric("Total Numbers Checked", len(st.session_state.phone_numbers))
-        st.metric("Users Found", len(st.session_state.found_users))
-        success_rate = (len(st.session_state.found_users) / len(st.session_state.phone_numbers)) * 100
+        st.metric("Users Found", len(results))
+        success_rate = (len(results) / len(st.session_state.phone_numbers)) * 100
         st.metric("Success Rate", f"{success_rate:.1f}%")
     
     # Download options
     st.subheader("📥 Download Results")
     
-    # Prepare download data
-    download_text = []
-    for user in st.session_state.found_users:
-        username_display = f"@{user['username']}" if user['username'] else "No username"
-        line = f"git {user['phone']}"
-        download_text.append(line)
+    # Files are built in memory only when asked for, and cached per job result
+    result_version = (results.job_id, results.offset)
+    
+    # Text file download
+    export_download(
+        "found phone numbers", ('text', result_version),
+        lambda: pd.DataFrame({'line': [f"git {phone}" for phone in results.column('phone')]}), 'txt',
+        "telegram_users_found"
+    )
+    
+    export_kind = st.selectbox("File format:", list(FORMATS), format_func=lambda kind: FORMATS[kind][0])
     
     col1, col2 = st.columns(2)
     
     with col1:
-        # Text file download
-        text_content = '\n'.join(download_text)
-        st.download_button(
-            label="📄 Download as Text File",
-            data=text_content,
-            file_name="telegram_users_found.txt",
-            mime="text/plain"
+        export_download(
+            "found users", ('found', result_version, export_kind), results.to_pandas, export_kind,
+            "telegram_users_found"
         )
     
+    # The uploaded sheet itself, with result columns added to every row
     with col2:
-        # Excel file download
-        excel_df = pd.DataFrame(st.session_state.found_users)
-        excel_buffer = pd.ExcelWriter('temp.xlsx', engine='openpyxl')
-        excel_df.to_excel(excel_buffer, index=False)
-        excel_buffer.close()
-        
-        with open('temp.xlsx', 'rb') as f:
-            st.download_button(
-                label="📊 Download as Excel File",
-                data=f.read(),
-                file_name="telegram_users_found.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        if parts and st.session_state.get('number_rows') is not None:
+            def annotated_sheet():
+                records = JobJournal(results.job_id).records()
+                frame = cache.uploads.get_or_compute(('frame', part_keys), lambda: read_parts_frame(parts))
+                rows = st.session_state.number_rows
+                numbers = pd.Series(pd.arrays.ArrowStringArray(unpack_numbers(rows.to_numpy())), index=rows.index)
+                return join_results(frame, numbers, records)
+            
+            export_download(
+                "your sheet with results", ('sheet', part_keys, result_version, export_kind),
+                annotated_sheet, export_kind, "telegram_results"
             )
 
 # Cleanup
 if st.session_state.client:
-    if st.button("🔐 Disconnect", help="Disconnect from Telegram"):
+    busy = runner.active_job(owner) is not None
+    if st.button("🔐 Disconnect", disabled=busy,
+                 help="Cancel the running search first" if busy else "Disconnect from Telegram"):
         try:
-            async def disconnect_client():
-                await st.session_state.client.disconnect()
-            
-            loop = get_or_create_event_loop()
-            loop.run_until_complete(disconnect_client())
+            # The stored session is kept, so connecting again needs no new code
+            sessions.release(phone_number, st.session_state.client)
             st.session_state.client = None
             st.session_state.authenticated = False
             st.session_state.auth_step = 'start'
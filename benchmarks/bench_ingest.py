@@ -0,0 +1,75 @@
+"""Serial vs parallel ingestion of many workbooks with several sheets each
+
+Writes --files synthetic workbooks of --sheets sheets and --rows rows per
+sheet, then normalizes all of them with read_parts at each worker count.
+The worker pool is started before timing, so the figures leave out process
+start-up, which the app pays again only after the pool has sat idle for
+TG_INGEST_IDLE_SECONDS. Every run must produce the
+same merged numbers as the serial one.
+
+Usage: python benchmarks/bench_ingest.py [--files 4] [--sheets 3] [--rows 20000] [--workers 1 2 4]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tg_checker.dedup import dedup_numbers
+from tg_checker.parallel import leased_pool, list_parts, read_parts, shutdown_pool
+
+COLUMN = 'Mobile Number'
+
+
+def make_workbook(path, sheets, rows, seed):
+    rng = np.random.default_rng(seed)
+    with pd.ExcelWriter(path) as writer:
+        for s in range(sheets):
+            national = rng.integers(6_000_000_000, 9_999_999_999, size=rows).astype(str)
+            prefix = rng.choice(np.array(['', '+91 ', '0']), size=rows)
+            df = pd.DataFrame({'Name': np.char.add('Person ', np.arange(rows).astype(str)),
+                               COLUMN: np.char.add(prefix, national)})
+            df.to_excel(writer, sheet_name=f"Sheet{s + 1}", index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', type=int, default=4)
+    parser.add_argument('--sheets', type=int, default=3)
+    parser.add_argument('--rows', type=int, default=20_000, help="Rows per sheet")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='tg-ingest-')
+    paths = [os.path.join(directory, f"list_{i}.xlsx") for i in range(args.files)]
+    for i, path in enumerate(paths):
+        make_workbook(path, args.sheets, args.rows, i)
+    parts = list_parts(paths)
+    print(f"{len(paths)} workbooks, {len(parts)} sheets, {len(parts) * args.rows} rows; {os.cpu_count()} CPUs")
+
+    print(f"{'workers':>8} {'seconds':>8} {'rows/s':>10} {'speedup':>8} {'unique':>8}")
+    baseline = expected = None
+    for workers in args.workers:
+        if workers > 1:
+            # Start the pool (and import pandas in every worker) outside the timing
+            with leased_pool(workers) as pool:
+                list(pool.map(abs, range(workers * 4)))
+        started = time.perf_counter()
+        rows, normalized = read_parts(parts, COLUMN, workers=workers)
+        unique = dedup_numbers(normalized.numbers).unique
+        seconds = time.perf_counter() - started
+        if expected is None:
+            baseline, expected = seconds, (normalized.numbers, unique)
+        elif not (normalized.numbers.equals(expected[0]) and np.array_equal(unique, expected[1])):
+            raise AssertionError(f"{workers} workers merged different numbers than {args.workers[0]}")
+        print(f"{workers:>8} {seconds:>8.2f} {rows / seconds:>10.0f} {baseline / seconds:>7.1f}x {len(unique):>8}")
+    shutdown_pool()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Memory per million numbers: Python lists and dicts vs packed int64 and Arrow tables
+
+Compares what the page used to keep in session state (a list of E.164
+strings and a list of found-user dicts) with the packed int64 numbers and
+the Arrow-backed ResultTable. Python containers are measured deeply with
+sys.getsizeof, counting each object once; NumPy, pandas and Arrow values by
+the size of their buffers.
+
+Usage: python benchmarks/bench_memory.py [--rows 1000000]
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tg_checker.lookup import found_user
+from tg_checker.normalize import normalize_numbers, pack_numbers, unpack_numbers
+from tg_checker.results import ResultTable
+
+
+def deep_size(value, seen=None):
+    """Bytes held by ``value`` and everything it references"""
+    seen = set() if seen is None else seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    if isinstance(value, ResultTable):
+        return value.table.nbytes
+    if isinstance(value, (pd.Series, pd.DataFrame)):
+        usage = value.memory_usage(deep=True, index=True)
+        return int(usage.sum() if hasattr(usage, 'sum') else usage)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    size = sys.getsizeof(value)
+    if isinstance(value, (list, tuple)):
+        size += sum(deep_size(v, seen) for v in value)
+    elif isinstance(value, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in value.items())
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    raw = pd.Series(rng.integers(6_000_000_000, 9_999_999_999, size=args.rows))
+    numbers = normalize_numbers(raw).numbers
+    # What the page used to keep: deduped.unique.tolist()
+    text = numbers.to_numpy(dtype=object).tolist()
+    packed = pack_numbers(numbers)
+    assert unpack_numbers(packed).to_pylist() == text
+    records = [{'phone': phone, 'found': True, 'user_id': i, 'first_name': 'User', 'last_name': phone[-4:],
+                'username': f"user{phone[-6:]}"} for i, phone in enumerate(text)]
+
+    def result_table():
+        table = ResultTable()
+        for start in range(0, len(records), 10_000):
+            table.append(records[start:start + 10_000])
+        return table
+
+    rows = [
+        ('numbers', 'list of E.164 str', lambda: text),
+        ('numbers', 'packed int64', lambda: pack_numbers(numbers)),
+        ('row map', 'string[pyarrow] Series', lambda: numbers),
+        ('row map', 'packed int64 Series', lambda: pd.Series(pack_numbers(numbers), index=numbers.index.copy())),
+        ('found users', 'list of dicts', lambda: [found_user(r) for r in records]),
+        ('found users', 'ResultTable (Arrow)', result_table),
+    ]
+    scale = 1_000_000 / args.rows
+    print(f"{'what':<12} {'representation':<24} {'MB per 1M':>10}")
+    baseline = {}
+    for what, name, build in rows:
+        mb = deep_size(build()) * scale / 2 ** 20
+        reduction = f"  {baseline[what] / mb:.1f}x smaller" if what in baseline else ''
+        baseline.setdefault(what, mb)
+        print(f"{what:<12} {name:<24} {mb:>10.1f}{reduction}")
+
+
+if __name__ == '__main__':
+    main()
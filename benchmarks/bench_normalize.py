@@ -0,0 +1,66 @@
+"""Benchmark normalize_numbers against the original per-cell clean_phone_numbers
+
+Usage: python benchmarks/bench_normalize.py [rows ...]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tg_checker.normalize import normalize_numbers
+
+
+def clean_phone_numbers(df, column_name):
+    """The original app.py implementation, kept here as the baseline"""
+    raw_numbers = df[column_name].astype(str)
+    phone_numbers = []
+    for num in raw_numbers:
+        digits_only = ''.join(filter(str.isdigit, num))
+        if len(digits_only) >= 10:
+            phone_numbers.append('+91' + digits_only[-10:])
+    return phone_numbers
+
+
+def synthetic_column(rows, seed=0):
+    """Mixed formats seen in real uploads, including some invalid rows"""
+    rng = np.random.default_rng(seed)
+    national = rng.integers(6_000_000_000, 9_999_999_999, size=rows).astype(str)
+    formats = rng.integers(0, 6, size=rows)
+    values = np.where(formats == 0, national, '')
+    values = np.where(formats == 1, np.char.add('+91 ', national), values)
+    values = np.where(formats == 2, np.char.add('0', national), values)
+    values = np.where(formats == 3, np.char.add('91-', national), values)
+    values = np.where(formats == 4, np.char.add('12', national), values)
+    values = np.where(formats == 5, np.char.add('5', national.astype('U9')), values)
+    return pd.DataFrame({'Mobile Number': values})
+
+
+def numeric_column(rows, seed=0):
+    """Excel stores bare numbers as floats, which is the common upload"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({'Mobile Number': rng.integers(5_000_000_000, 9_999_999_999, size=rows).astype(float)})
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main(sizes):
+    print(f"{'column':>8} {'rows':>10} {'legacy s':>10} {'vector s':>10} {'speedup':>8} {'kept':>10} rejected")
+    for kind, make in (('text', synthetic_column), ('numeric', numeric_column)):
+        for rows in sizes:
+            df = make(rows)
+            legacy, legacy_s = timed(clean_phone_numbers, df, 'Mobile Number')
+            result, vector_s = timed(normalize_numbers, df['Mobile Number'])
+            print(f"{kind:>8} {rows:>10} {legacy_s:>10.3f} {vector_s:>10.3f} {legacy_s / vector_s:>7.1f}x "
+                  f"{len(result.numbers):>10} {result.rejected}")
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000])
@@ -0,0 +1,151 @@
+"""End-to-end offline benchmark: ingest, normalize, dedup, lookup and export
+
+Runs the pipeline against FakeTelegramClient at several input sizes and
+reports throughput and peak memory per stage. Peak memory is the highest
+resident set size seen while the stage ran, minus the size before it.
+
+Usage: python benchmarks/bench_pipeline.py [--sizes 10000 100000 1000000] [--format csv]
+"""
+import argparse
+import asyncio
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tg_checker.dedup import dedup_numbers, join_results
+from tg_checker.fake import FakeTelegramClient
+from tg_checker.ingest import read_frame, read_normalized
+from tg_checker.lookup import find_users
+from tg_checker.scheduler import BatchScheduler
+
+COLUMN = 'Mobile Number'
+
+
+def rss_bytes():
+    """Current resident set size, or 0 where /proc is unavailable"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return 0
+
+
+class PeakMemory:
+    """Samples RSS on a background thread while the block runs"""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, rss_bytes())
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self.start = rss_bytes()
+        self.peak = self.start
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, rss_bytes())
+
+    @property
+    def delta_mb(self):
+        return (self.peak - self.start) / 2 ** 20
+
+
+def make_input(rows, kind, directory, seed=0):
+    """Synthetic upload with mixed formats, ~10% duplicates and some invalid rows"""
+    path = os.path.join(directory, f"input_{rows}.{kind}")
+    if os.path.exists(path):
+        return path
+    rng = np.random.default_rng(seed)
+    national = rng.integers(6_000_000_000, 9_999_999_999, size=rows)
+    duplicates = rng.random(rows) < 0.1
+    national[duplicates] = rng.choice(national, size=duplicates.sum())
+    text = national.astype(str)
+    style = rng.integers(0, 4, size=rows)
+    numbers = np.where(style == 1, np.char.add('+91 ', text), text)
+    numbers = np.where(style == 2, np.char.add('0', text), numbers)
+    numbers = np.where(style == 3, np.char.add('5', text.astype('U9')), numbers)
+    df = pd.DataFrame({'Name': np.char.add('Person ', np.arange(rows).astype(str)), COLUMN: numbers})
+    if kind == 'csv':
+        df.to_csv(path, index=False)
+    elif kind == 'parquet':
+        df.to_parquet(path, index=False)
+    else:
+        df.to_excel(path, index=False, engine='openpyxl')
+    return path
+
+
+def run_size(rows, args, directory):
+    path = make_input(rows, args.format, directory)
+    client = FakeTelegramClient(hit_ratio=args.hit_ratio, latency=args.latency,
+                                flood_rate=args.flood_rate, flood_seconds=0)
+    stages = []
+
+    def stage(name, count, fn):
+        with PeakMemory() as memory:
+            started = time.perf_counter()
+            result = fn()
+            elapsed = time.perf_counter() - started
+        stages.append((name, count, elapsed, memory.delta_mb))
+        return result
+
+    _, normalized = stage('ingest+normalize', rows, lambda: read_normalized(path, COLUMN))
+    deduped = stage('dedup', len(normalized.numbers), lambda: dedup_numbers(normalized.numbers))
+    numbers = deduped.unique.tolist()
+    scheduler = BatchScheduler(interval=0, backoff_base=0)
+    records = stage('lookup', len(numbers), lambda: asyncio.run(
+        find_users(client, numbers, args.batch_size, 0, scheduler=scheduler)
+    ))
+
+    def export():
+        joined = join_results(read_frame(path), normalized.numbers, records)
+        buffer = io.BytesIO()
+        joined.to_csv(buffer, index=False)
+        return buffer.getbuffer().nbytes
+
+    stage('join+export csv', rows, export)
+
+    for name, count, elapsed, memory in stages:
+        print(f"{rows:>9} {name:<18} {count:>9} {elapsed:>9.2f} {count / elapsed if elapsed else 0:>12,.0f} "
+              f"{memory:>9.1f}")
+    found = sum(r['found'] for r in records)
+    print(f"{'':>9} {len(records)} numbers checked, {found} found, {client.requests} requests, "
+          f"{scheduler.stats['flood_waits']} flood waits, {scheduler.stats['contacts_deleted']} contacts cleaned up")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--format', choices=['csv', 'parquet', 'xlsx'], default='csv')
+    parser.add_argument('--batch-size', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds per fake request")
+    parser.add_argument('--hit-ratio', type=float, default=0.3)
+    parser.add_argument('--flood-rate', type=float, default=0.0, help="Chance an import raises FloodWaitError")
+    parser.add_argument('--dir', help="Where generated inputs are kept between runs")
+    args = parser.parse_args()
+
+    directory = args.dir or tempfile.mkdtemp(prefix='tg-bench-')
+    print(f"{'rows':>9} {'stage':<18} {'items':>9} {'seconds':>9} {'items/s':>12} {'peak MB':>9}")
+    for rows in args.sizes:
+        run_size(rows, args, directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,284 @@
+"""Rerun-latency harness: drive app.py headlessly with Streamlit's AppTest
+
+Every interaction reruns app.py from the top, so this walks the page through
+upload, column selection, results and export against synthetic uploads of
+increasing size. Each rerun is timed, and the time and memory allocated are
+also broken down by page section (the st.header/st.subheader calls). Lookups
+run beforehand against the offline fake client, so no Telegram account is
+needed.
+
+tracemalloc slows Python down several times over, so every size is walked
+twice: once for wall time (and cProfile), and once more with cold caches
+under tracemalloc for the allocation figures.
+
+With --profile-dir each rerun's cProfile stats are written there as .prof
+files. The exit status is 1 when a steady-state rerun (one that parses and
+exports nothing new) exceeds --budget seconds, or any rerun exceeds
+--budget-all.
+
+Usage: python benchmarks/profile_reruns.py [--sizes 1000 10000 100000] [--budget 1.0] [--profile-dir DIR]
+"""
+import argparse
+import asyncio
+import cProfile
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Keep runs self-contained: no metrics server, no metrics log, data in a temp dir
+DATA_DIR = tempfile.mkdtemp(prefix='tg-reruns-')
+os.environ.setdefault('TG_DATA_DIR', DATA_DIR)
+os.environ.setdefault('TG_METRICS_PORT', '0')
+os.environ.setdefault('TG_METRICS_LOG', '')
+
+COLUMN = 'Mobile Number'
+
+# Reruns that should cost about the same however large the upload is
+STEADY_STEPS = ('rerun', 'results rerun')
+
+# Runs inside the script thread: swaps the uploader for the synthetic file,
+# marks sections at every header and hands app.py to the recorder
+WRAPPER = '''
+import streamlit as st
+
+import _rerun_recorder as recorder
+
+if not getattr(st, '_rerun_recorder_patched', False):
+    st._rerun_recorder_patched = True
+    st.file_uploader = recorder.uploader
+    for name in ('header', 'subheader'):
+        def marker(body, *args, _original=getattr(st, name), **kwargs):
+            recorder.mark(body)
+            return _original(body, *args, **kwargs)
+        setattr(st, name, marker)
+
+recorder.run_app(globals())
+'''
+
+
+class Recorder:
+    """Per-rerun timings, allocations and profiles, shared with the wrapper script"""
+
+    def __init__(self):
+        self.trace = False
+        self.profile = False
+        self.upload_path = None
+        self.sections = []
+        self.profiler = None
+        self._section = None
+
+    def uploader(self, label, type=None, accept_multiple_files=False, **kwargs):
+        with open(self.upload_path, 'rb') as f:
+            upload = io.BytesIO(f.read())
+        upload.name = os.path.basename(self.upload_path)
+        upload.size = len(upload.getvalue())
+        upload.file_id = self.upload_path
+        return [upload] if accept_multiple_files else upload
+
+    def _close(self):
+        if self._section is not None:
+            name, started, before = self._section
+            peak = tracemalloc.get_traced_memory()[1] if self.trace else 0
+            self.sections.append({
+                'section': name, 'seconds': time.perf_counter() - started,
+                'alloc_mb': (peak - before) / 2 ** 20, 'peak_bytes': peak,
+            })
+            self._section = None
+
+    def mark(self, name):
+        self._close()
+        if self.trace:
+            tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0] if self.trace else 0
+        self._section = (name, time.perf_counter(), before)
+
+    def run_app(self, namespace):
+        self.sections = []
+        self.profiler = cProfile.Profile() if self.profile else None
+        path = os.path.join(ROOT, 'app.py')
+        with open(path, encoding='utf-8') as f:
+            code = compile(f.read(), path, 'exec')
+        namespace['__file__'] = path
+        self.mark('top')
+        if self.profiler:
+            self.profiler.enable()
+        try:
+            exec(code, namespace)
+        finally:
+            if self.profiler:
+                self.profiler.disable()
+            self._close()
+
+
+def make_upload(rows, kind, directory):
+    import numpy as np
+    import pandas as pd
+
+    path = os.path.join(directory, f"upload_{rows}.{kind}")
+    if os.path.exists(path):
+        return path
+    rng = np.random.default_rng(rows)
+    national = rng.integers(6_000_000_000, 9_999_999_999, size=rows).astype(str)
+    prefix = rng.choice(np.array(['', '+91 ', '0']), size=rows)
+    df = pd.DataFrame({'Name': np.char.add('Person ', np.arange(rows).astype(str)),
+                       COLUMN: np.char.add(prefix, national)})
+    if kind == 'csv':
+        df.to_csv(path, index=False)
+    elif kind == 'parquet':
+        df.to_parquet(path, index=False)
+    else:
+        df.to_excel(path, index=False)
+    return path
+
+
+def run_lookups(at):
+    """Journal a finished lookup for the page's numbers, as a completed job would"""
+    from tg_checker.fake import FakeTelegramClient
+    from tg_checker.journal import JobJournal
+    from tg_checker.lookup import find_users
+    from tg_checker.normalize import unpack_numbers
+    from tg_checker.scheduler import BatchScheduler
+    from tg_checker.store import ResultStore
+
+    numbers = unpack_numbers(at.session_state['phone_numbers']).to_pylist()
+    journal = JobJournal(at.session_state['job_id'])
+    journal.discard()
+    asyncio.run(find_users(FakeTelegramClient(), numbers, 50, 0, ResultStore(), journal,
+                           scheduler=BatchScheduler(interval=0), cleanup=False))
+
+
+def measure(recorder, step, action, profile_dir, size):
+    """Run one AppTest interaction and collect its timings.
+
+    ``alloc_mb`` is the highest traced memory seen during any section of the
+    rerun, above what was allocated before it started.
+    """
+    before = tracemalloc.get_traced_memory()[0] if recorder.trace else 0
+    started = time.perf_counter()
+    at = action()
+    seconds = time.perf_counter() - started
+    peak = max((s['peak_bytes'] for s in recorder.sections), default=before)
+    alloc = max(peak - before, 0) / 2 ** 20 if recorder.trace else 0.0
+    if at.exception:
+        raise RuntimeError(f"{step}: app raised {at.exception[0].value}")
+    if recorder.profiler and profile_dir:
+        name = f"{size}_{step.replace(' ', '_')}.prof"
+        recorder.profiler.dump_stats(os.path.join(profile_dir, name))
+    return {'size': size, 'step': step, 'seconds': seconds, 'alloc_mb': alloc, 'sections': list(recorder.sections)}
+
+
+def run_size(size, args, recorder, directory):
+    from streamlit.testing.v1 import AppTest
+
+    recorder.upload_path = make_upload(size, args.format, directory)
+    wrapper = os.path.join(directory, 'wrapper.py')
+    with open(wrapper, 'w', encoding='utf-8') as f:
+        f.write(WRAPPER)
+    at = AppTest.from_file(wrapper, default_timeout=args.timeout)
+
+    def click(label):
+        return lambda: [b for b in at.button if label in b.label][0].click().run()
+
+    results = []
+
+    def step(name, action):
+        results.append(measure(recorder, name, action, args.profile_dir, size))
+
+    step('upload', at.run)
+    step('select column', lambda: at.selectbox[0].set_value(COLUMN).run())
+    step('rerun', at.run)
+    at.session_state['client'] = None
+    at.session_state['authenticated'] = True
+    at.session_state['auth_step'] = 'authenticated'
+    # The lookup section names the job; journal its results, then time the page picking them up
+    at.run()
+    run_lookups(at)
+    step('results', at.run)
+    step('results rerun', at.run)
+    step('export text', click('Prepare found phone numbers'))
+    step('export found users', click('Prepare found users'))
+    step('export sheet', click('Prepare your sheet'))
+    step('rerun', at.run)
+    return results
+
+
+def reset_caches():
+    """Forget parsed uploads and exports so the next pass starts cold"""
+    from tg_checker import cache
+
+    cache.uploads.clear()
+    cache.exports.clear()
+    cache._hashes.clear()
+
+
+def merge_allocations(timed, traced):
+    """Copy allocation figures from the traced pass onto the timed one"""
+    for rerun, traced_rerun in zip(timed, traced):
+        rerun['alloc_mb'] = traced_rerun['alloc_mb']
+        for section, traced_section in zip(rerun['sections'], traced_rerun['sections']):
+            if section['section'] == traced_section['section']:
+                section['alloc_mb'] = traced_section['alloc_mb']
+        for section in rerun['sections']:
+            section.pop('peak_bytes', None)
+
+
+def report(results):
+    print(f"{'rows':>8} {'step':<20} {'seconds':>8} {'alloc MB':>9}  slowest sections")
+    for r in results:
+        slowest = sorted(r['sections'], key=lambda s: s['seconds'], reverse=True)[:3]
+        sections = ', '.join(f"{s['section'][:24]} {s['seconds']:.3f}s/{s['alloc_mb']:.1f}MB" for s in slowest)
+        print(f"{r['size']:>8} {r['step']:<20} {r['seconds']:>8.3f} {r['alloc_mb']:>9.1f}  {sections}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--format', choices=['csv', 'parquet', 'xlsx'], default='csv')
+    parser.add_argument('--budget', type=float, default=1.0, help="Max seconds for a steady-state rerun")
+    parser.add_argument('--budget-all', type=float, help="Max seconds for any rerun")
+    parser.add_argument('--profile-dir', help="Write cProfile stats of every rerun here")
+    parser.add_argument('--json', help="Write all measurements to this file")
+    parser.add_argument('--no-trace', action='store_true', help="Skip the tracemalloc pass")
+    parser.add_argument('--timeout', type=float, default=300, help="AppTest timeout per rerun")
+    args = parser.parse_args()
+
+    recorder = Recorder()
+    sys.modules['_rerun_recorder'] = recorder
+    if args.profile_dir:
+        os.makedirs(args.profile_dir, exist_ok=True)
+
+    directory = tempfile.mkdtemp(prefix='tg-uploads-')
+    results = []
+    for size in args.sizes:
+        recorder.trace, recorder.profile = False, bool(args.profile_dir)
+        timed = run_size(size, args, recorder, directory)
+        if not args.no_trace:
+            reset_caches()
+            recorder.trace, recorder.profile = True, False
+            tracemalloc.start()
+            try:
+                merge_allocations(timed, run_size(size, args, recorder, directory))
+            finally:
+                tracemalloc.stop()
+        results += timed
+    report(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=1)
+
+    over = [r for r in results if (r['step'] in STEADY_STEPS and r['seconds'] > args.budget)
+            or (args.budget_all is not None and r['seconds'] > args.budget_all)]
+    for r in over:
+        print(f"OVER BUDGET: {r['size']} rows, {r['step']} took {r['seconds']:.3f}s", file=sys.stderr)
+    return 1 if over else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,10 @@
+"""Keep test runs away from the real data directory and metrics log"""
+import os
+import sys
+import tempfile
+
+os.environ['TG_DATA_DIR'] = tempfile.mkdtemp(prefix='tg-tests-')
+os.environ['TG_METRICS_LOG'] = ''
+os.environ['TG_METRICS_PORT'] = '0'
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,209 @@
+"""find_users against FakeTelegramClient, with a clock that only moves when the scheduler sleeps"""
+import asyncio
+
+import pytest
+from telethon.errors import FloodWaitError
+
+from tg_checker.fake import FakeTelegramClient
+from tg_checker.journal import JobJournal
+from tg_checker.lookup import find_users
+from tg_checker.scheduler import BACKOFF_BASE, MAX_ATTEMPTS, BatchScheduler
+from tg_checker.store import ResultStore
+
+NUMBERS = [f"+9198765{i:05d}" for i in range(25)]
+OWN_CONTACTS = {1, 2, 3}
+
+
+class Interrupted(Exception):
+    pass
+
+
+class FakeClock:
+    """Monotonic time that advances by exactly what is slept"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.now += seconds
+
+
+def run(client, numbers=NUMBERS, batch_size=10, delay=0, **kwargs):
+    clock = FakeClock()
+    scheduler = BatchScheduler(interval=delay, clock=clock, sleep=clock.sleep)
+    records = asyncio.run(find_users(client, numbers, batch_size, delay, scheduler=scheduler, **kwargs))
+    return records, scheduler, clock
+
+
+def check_records(client, records, numbers=NUMBERS):
+    assert [r['phone'] for r in records] == numbers
+    assert [r['found'] for r in records] == [client.has_account(n) for n in numbers]
+
+
+def test_every_number_gets_a_record_in_input_order():
+    client = FakeTelegramClient(hit_ratio=0.5)
+    records, scheduler, _ = run(client)
+    check_records(client, records)
+    assert client.imports == 3
+    assert scheduler.stats['batches'] == 3
+
+
+def test_batches_start_delay_seconds_apart():
+    client = FakeTelegramClient()
+    _, scheduler, clock = run(client, delay=60)
+    assert clock.now == 120
+    assert scheduler.stats['pacing_seconds'] == 120
+
+
+def test_flood_wait_is_waited_out_and_the_same_batch_retried():
+    client = FakeTelegramClient(hit_ratio=0.5, errors=[None, FloodWaitError(None, capture=30)])
+    records, scheduler, clock = run(client)
+    check_records(client, records)
+    assert client.imports == 4
+    assert scheduler.stats['flood_waits'] == 1
+    assert scheduler.stats['flood_wait_seconds'] == 30
+    assert scheduler.stats['retries'] == 0
+    assert clock.now == 30
+
+
+def test_flood_wait_shorter_than_the_delay_adds_no_wait():
+    client = FakeTelegramClient(errors=[None, FloodWaitError(None, capture=30)])
+    _, scheduler, clock = run(client, delay=60)
+    assert clock.now == 180
+    assert scheduler.stats['flood_wait_seconds'] == 0
+
+
+def test_failed_batch_is_retried_with_backoff():
+    client = FakeTelegramClient(hit_ratio=0.5, errors=[RuntimeError('boom')])
+    records, scheduler, clock = run(client, batch_size=25)
+    check_records(client, records)
+    assert scheduler.stats['retries'] == 1
+    assert clock.now == BACKOFF_BASE
+
+
+def test_batch_given_up_leaves_the_journal_open_for_a_rerun(tmp_path):
+    journal = JobJournal('job', root=tmp_path)
+    # Batches 2 and 3 run while batch 1 backs off, then batch 1 fails every retry
+    boom = RuntimeError('boom')
+    client = FakeTelegramClient(hit_ratio=0.5, errors=[boom, None, None] + [boom] * (MAX_ATTEMPTS - 1))
+    errors = []
+    records, scheduler, _ = run(client, journal=journal, on_error=lambda num, e: errors.append(num))
+    assert scheduler.failed == [1]
+    assert errors == [1] * MAX_ATTEMPTS
+    assert [r['phone'] for r in records] == NUMBERS[10:]
+    assert not journal.is_finished()
+
+    # The rerun only looks up the batch that was given up
+    client = FakeTelegramClient(hit_ratio=0.5)
+    resumed = JobJournal('job', root=tmp_path)
+    records, _, _ = run(client, journal=resumed)
+    check_records(client, records)
+    assert client.imports == 1
+    assert resumed.is_finished()
+
+
+def test_resume_skips_journaled_batches(tmp_path):
+    journal = JobJournal('job', root=tmp_path)
+    client = FakeTelegramClient(hit_ratio=0.5)
+
+    def interrupt(num, total, records):
+        if num == 2:
+            raise Interrupted
+
+    with pytest.raises(Interrupted):
+        run(client, journal=journal, on_batch=interrupt)
+    assert set(journal.completed()) == {0, 1, 2}
+    assert JobJournal('job', root=tmp_path).progress() == (2, 3)
+    assert not journal.is_finished()
+
+    client = FakeTelegramClient(hit_ratio=0.5)
+    resumed = JobJournal('job', root=tmp_path)
+    records, _, _ = run(client, journal=resumed)
+    check_records(client, records)
+    assert client.imports == 1
+    assert resumed.is_finished()
+
+
+def test_deferred_numbers_are_requeued_before_the_journal_finishes(tmp_path):
+    journal = JobJournal('job', root=tmp_path)
+    client = FakeTelegramClient(hit_ratio=0.5, defer={NUMBERS[3]: 2})
+    records, scheduler, _ = run(client, journal=journal)
+    check_records(client, records)
+    assert journal.requeued() == {4: [NUMBERS[3]], 5: [NUMBERS[3]]}
+    assert JobJournal('job', root=tmp_path).progress() == (5, 5)
+    assert scheduler.stats['retries'] == 2
+    assert journal.is_finished()
+
+
+def test_number_deferred_past_max_attempts_is_given_up(tmp_path):
+    journal = JobJournal('job', root=tmp_path)
+    client = FakeTelegramClient(hit_ratio=0.5, defer={NUMBERS[3]: MAX_ATTEMPTS})
+    records, _, _ = run(client, journal=journal)
+    assert NUMBERS[3] not in [r['phone'] for r in records]
+    assert not journal.is_finished()
+
+    client = FakeTelegramClient(hit_ratio=0.5)
+    resumed = JobJournal('job', root=tmp_path)
+    records, _, _ = run(client, journal=resumed)
+    check_records(client, records)
+    assert client.imports == 1
+    assert resumed.is_finished()
+
+
+def test_cleanup_deletes_imported_contacts_only():
+    client = FakeTelegramClient(hit_ratio=0.5)
+    own = client.user_for(next(n for n in NUMBERS if client.has_account(n))).id
+    client.contacts = OWN_CONTACTS | {own}
+    _, scheduler, _ = run(client)
+    assert client.contacts == OWN_CONTACTS | {own}
+    assert scheduler.stats['contacts_deleted'] == sum(map(client.has_account, NUMBERS)) - 1
+
+
+def test_without_cleanup_imported_contacts_stay():
+    client = FakeTelegramClient(hit_ratio=0.5, contacts=OWN_CONTACTS)
+    run(client, cleanup=False)
+    assert len(client.contacts) == len(OWN_CONTACTS) + sum(map(client.has_account, NUMBERS))
+
+
+def test_resume_reuses_the_journaled_contact_set(tmp_path):
+    journal = JobJournal('job', root=tmp_path)
+    client = FakeTelegramClient(hit_ratio=0.5, contacts=OWN_CONTACTS, errors=[RuntimeError('boom')] * MAX_ATTEMPTS)
+    run(client, batch_size=25, journal=journal)
+    assert journal.contacts() == OWN_CONTACTS
+
+    # A placeholder an interrupted import left behind is not the user's own contact
+    placeholder = client.user_for(next(n for n in NUMBERS if client.has_account(n))).id
+    client.contacts.add(placeholder)
+    run(client, batch_size=25, journal=JobJournal('job', root=tmp_path))
+    assert client.contacts == OWN_CONTACTS
+
+
+def test_cancelled_job_still_cleans_up_its_batch():
+    client = FakeTelegramClient(hit_ratio=0.5, latency=0.05, contacts=OWN_CONTACTS)
+
+    async def main():
+        task = asyncio.ensure_future(find_users(client, NUMBERS, 25, 0))
+        # Cancel while the import is in flight; its contacts are deleted anyway
+        await asyncio.sleep(0.07)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        await asyncio.sleep(0.2)
+
+    asyncio.run(main())
+    assert client.contacts == OWN_CONTACTS
+
+
+def test_cached_numbers_are_not_looked_up_again(tmp_path):
+    store = ResultStore(path=str(tmp_path / 'results.sqlite3'))
+    run(FakeTelegramClient(hit_ratio=0.5), store=store)
+
+    client = FakeTelegramClient(hit_ratio=0.5)
+    records, _, _ = run(client, store=store)
+    check_records(client, records)
+    assert client.imports == 0
@@ -0,0 +1,84 @@
+import pandas as pd
+import pytest
+
+from tg_checker.normalize import REJECT_REASONS, country_for, normalize_numbers, pack_numbers, unpack_numbers
+
+ACCEPTED = [
+    # raw, default country, E.164
+    ('9876543210', 'IN', '+919876543210'),
+    ('+91 98765 43210', 'IN', '+919876543210'),
+    ('98765-43210', 'IN', '+919876543210'),
+    ('09876543210', 'IN', '+919876543210'),
+    ('919876543210', 'IN', '+919876543210'),
+    ('0091 9876543210', 'IN', '+919876543210'),
+    (9876543210.0, 'IN', '+919876543210'),
+    ('+1 202 555 0143', 'IN', '+12025550143'),
+    ('+94 77 123 4567', 'IN', '+94771234567'),
+    ('2025550143', 'US', '+12025550143'),
+    ('0771234567', 'LK', '+94771234567'),
+    ('94771234567', 'LK', '+94771234567'),
+    ('07911 123456', 'GB', '+447911123456'),
+    ('0771234567', '+94', '+94771234567'),
+]
+
+REJECTED = [
+    # raw, default country, reason
+    ('', 'IN', 'empty'),
+    (None, 'IN', 'empty'),
+    ('n/a', 'IN', 'empty'),
+    ('+999 123', 'IN', 'country'),
+    ('12345', 'IN', 'length'),
+    ('98765432101234', 'IN', 'length'),
+    ('5876543210', 'IN', 'prefix'),
+]
+
+
+@pytest.mark.parametrize('raw, country, expected', ACCEPTED)
+def test_accepted(raw, country, expected):
+    normalized = normalize_numbers(pd.Series([raw]), country)
+    assert normalized.numbers.tolist() == [expected]
+    assert not any(normalized.rejected.values())
+
+
+@pytest.mark.parametrize('raw, country, reason', REJECTED)
+def test_rejected(raw, country, reason):
+    normalized = normalize_numbers(pd.Series([raw]), country)
+    assert normalized.numbers.empty
+    assert normalized.rejected == {r: int(r == reason) for r in REJECT_REASONS}
+
+
+def test_country_column_overrides_the_default():
+    values = pd.Series(['0771234567', '9876543210', '2025550143'], index=[10, 11, 12])
+    countries = pd.Series(['LK', None, '+1'], index=[10, 11, 12])
+    normalized = normalize_numbers(values, 'IN', countries)
+    assert normalized.numbers.to_dict() == {10: '+94771234567', 11: '+919876543210', 12: '+12025550143'}
+
+
+def test_unsupported_default_country():
+    with pytest.raises(ValueError):
+        normalize_numbers(pd.Series(['9876543210']), 'XX')
+
+
+@pytest.mark.parametrize('value, expected', [('in', 'IN'), ('+94', 'LK'), (44, 'GB'), ('44.0', 'GB'), ('0091', 'IN'),
+                                             ('XX', None), (None, None), (float('nan'), None)])
+def test_country_for(value, expected):
+    assert country_for(value) == expected
+
+
+def test_pack_round_trip():
+    numbers = ['+919876543210', '+12025550143', '+94771234567', '+447911123456']
+    packed = pack_numbers(numbers)
+    assert packed.tolist() == [919876543210, 12025550143, 94771234567, 447911123456]
+    assert unpack_numbers(packed).to_pylist() == numbers
+
+
+@pytest.mark.parametrize('values, rejected', [
+    (pd.Series([9876543210.0, 1e20]), {'length': 1}),
+    (pd.Series([9876543210.0, float('inf'), float('nan')]), {'empty': 2}),
+    (pd.Series([9876543210, 2 ** 64 - 1], dtype='uint64'), {'length': 1}),
+    (pd.Series([9876543210, None], dtype='Int64'), {'empty': 1}),
+])
+def test_numeric_cells_out_of_int64_range_are_rejected(values, rejected):
+    normalized = normalize_numbers(values, 'IN')
+    assert normalized.numbers.tolist() == ['+919876543210']
+    assert normalized.rejected == {r: rejected.get(r, 0) for r in REJECT_REASONS}
@@ -0,0 +1,28 @@
+from tg_checker import parallel
+
+
+def test_ending_one_lease_leaves_the_pool_to_the_others():
+    with parallel.leased_pool(2, idle_seconds=0) as pool:
+        with parallel.leased_pool(2, idle_seconds=0) as other:
+            assert other is pool
+        assert parallel._pool is pool
+    assert parallel._pool is None
+
+
+def test_idle_pool_is_stopped_after_the_timeout():
+    with parallel.leased_pool(2, idle_seconds=0.05):
+        pass
+    timer = parallel._idle_timer
+    assert parallel._pool is not None and timer is not None
+    timer.join(1)
+    assert parallel._pool is None and parallel._idle_timer is None
+
+
+def test_new_lease_cancels_the_idle_timer():
+    with parallel.leased_pool(2, idle_seconds=0.05):
+        pass
+    timer = parallel._idle_timer
+    with parallel.leased_pool(2, idle_seconds=0) as pool:
+        timer.join(1)
+        assert parallel._pool is pool
+    assert parallel._pool is None
@@ -0,0 +1,48 @@
+import time
+
+from tg_checker import runner
+from tg_checker.fake import FakeTelegramClient
+from tg_checker.lookup import find_users
+from tg_checker.scheduler import BatchScheduler
+
+NUMBERS = [f"+9198765{i:05d}" for i in range(25)]
+
+
+def wait_for(job, timeout=10):
+    deadline = time.monotonic() + timeout
+    while job.is_active() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return job.snapshot()
+
+
+def lookup(client):
+    async def no_sleep(seconds):
+        pass
+
+    def make_coro(job):
+        scheduler = BatchScheduler(backoff_base=0, sleep=no_sleep)
+        return find_users(client, NUMBERS, 10, 0, on_batch=job.on_batch, scheduler=scheduler, cleanup=False)
+    return make_coro
+
+
+def test_progress_counts_batches_that_finish_out_of_order():
+    # Batch 1 fails first and finishes last
+    client = FakeTelegramClient(errors=[RuntimeError('boom')])
+    snapshot = wait_for(runner.start_job('out-of-order', lookup(client)))
+    assert snapshot['state'] == runner.DONE
+    assert (snapshot['done_batches'], snapshot['total_batches']) == (3, 3)
+    assert snapshot['tail'] == []
+
+
+def test_resumed_job_counts_earlier_batches():
+    snapshot = wait_for(runner.start_job('resumed', lookup(FakeTelegramClient()), done_batches=2))
+    assert snapshot['done_batches'] == 5
+
+
+def test_only_recent_finished_jobs_are_kept(monkeypatch):
+    monkeypatch.setattr(runner, 'MAX_FINISHED_JOBS', 2)
+    for i in range(4):
+        wait_for(runner.start_job(f"evict-{i}", lookup(FakeTelegramClient())))
+    runner.start_job('evict-last', lookup(FakeTelegramClient()))
+    assert runner.get_job('evict-0') is None and runner.get_job('evict-1') is None
+    assert runner.get_job('evict-3') is not None
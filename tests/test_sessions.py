@@ -0,0 +1,107 @@
+"""Stored sessions only reopen with the API credentials they were authorized with"""
+import os
+
+import pytest
+from telethon.crypto import AuthKey
+from telethon.sessions import SQLiteSession, StringSession
+
+from tg_checker import sessions
+
+PHONE = '+91 98765 43210'
+
+
+class DummyClient:
+    """Records the session it was built on instead of talking to Telegram"""
+
+    def __init__(self, session, api_id, api_hash, **kwargs):
+        self.session = SQLiteSession(session) if isinstance(session, str) else session
+        self.kwargs = kwargs
+        self.disconnected = False
+
+    async def disconnect(self):
+        self.disconnected = True
+
+
+@pytest.fixture(autouse=True)
+def session_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(sessions, 'SESSION_DIR', str(tmp_path))
+    monkeypatch.setattr(sessions, '_clients', {})
+    monkeypatch.setattr(sessions, '_cleaned', True)
+    return tmp_path
+
+
+def login(api_id=1, api_hash='secret', backend='string'):
+    """A fresh client that logs in and is saved, as the app does after a code"""
+    client = sessions.get_client(PHONE, api_id, api_hash, backend, client_class=DummyClient)
+    client.session.set_dc(2, '149.154.167.51', 443)
+    client.session.auth_key = AuthKey(os.urandom(256))
+    sessions.save(PHONE, client, api_id, api_hash, backend)
+    return client
+
+
+def test_login_binds_the_session_to_its_credentials():
+    client = login()
+    assert sessions.has_session(PHONE, 'string')
+    assert sessions.credentials_match(PHONE, 1, 'secret', 'string')
+    assert not sessions.credentials_match(PHONE, 1, 'guess', 'string')
+    assert not sessions.credentials_match(PHONE, 2, 'secret', 'string')
+    assert sessions.get_client(PHONE, 1, 'secret', 'string', client_class=DummyClient) is client
+
+
+def test_clients_leave_flood_waits_to_the_scheduler():
+    client = sessions.get_client(PHONE, 1, 'secret', 'string', client_class=DummyClient)
+    assert client.kwargs['flood_sleep_threshold'] == 0
+
+
+def test_other_credentials_get_a_fresh_session_and_leave_the_owner_connected():
+    owner = login()
+    other = sessions.get_client(PHONE, 2, 'guess', 'string', client_class=DummyClient)
+    assert other is not owner
+    assert isinstance(other.session, StringSession) and other.session.auth_key is None
+    assert not owner.disconnected
+    assert sessions.get_client(PHONE, 1, 'secret', 'string', client_class=DummyClient) is owner
+
+
+def test_stored_session_reopens_after_a_restart(monkeypatch):
+    owner = login()
+    monkeypatch.setattr(sessions, '_clients', {})
+    client = sessions.get_client(PHONE, 1, 'secret', 'string', client_class=DummyClient)
+    assert client is not owner
+    assert client.session.auth_key.key == owner.session.auth_key.key
+
+
+def test_session_without_credentials_hash_is_not_reused(session_dir):
+    stored = StringSession()
+    stored.set_dc(2, '149.154.167.51', 443)
+    stored.auth_key = AuthKey(os.urandom(256))
+    (session_dir / '919876543210.string').write_text(stored.save())
+    client = sessions.get_client(PHONE, 1, 'secret', 'string', client_class=DummyClient)
+    assert not sessions.credentials_match(PHONE, 1, 'secret', 'string')
+    assert client.session.auth_key is None
+
+
+def test_new_login_replaces_the_stored_session():
+    owner = login()
+    replacement = login(api_id=2, api_hash='other')
+    assert sessions.credentials_match(PHONE, 2, 'other', 'string')
+    assert not sessions.credentials_match(PHONE, 1, 'secret', 'string')
+    assert not owner.disconnected
+    assert sessions.get_client(PHONE, 2, 'other', 'string', client_class=DummyClient) is replacement
+
+
+def test_file_backend_stores_the_login(monkeypatch, session_dir):
+    owner = login(backend='file')
+    assert oct(os.stat(session_dir / '919876543210.session').st_mode & 0o777) == '0o600'
+    monkeypatch.setattr(sessions, '_clients', {})
+    client = sessions.get_client(PHONE, 1, 'secret', 'file', client_class=DummyClient)
+    assert isinstance(client.session, SQLiteSession)
+    assert client.session.auth_key.key == owner.session.auth_key.key
+    assert client.session.dc_id == 2
+
+
+def test_forget_deletes_the_session_and_its_credentials_hash(session_dir):
+    client = login()
+    sessions.forget(PHONE, client)
+    assert client.disconnected
+    assert os.listdir(session_dir) == []
+    assert sessions.get_client(PHONE, 1, 'secret', 'string', client_class=DummyClient) is not client
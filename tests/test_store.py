@@ -0,0 +1,29 @@
+import time
+
+from tg_checker import store as store_module
+from tg_checker.settings import RESULT_TTL_DAYS
+from tg_checker.store import ResultStore
+
+
+def record(phone, days_old):
+    return {'phone': phone, 'found': False, 'user_id': None, 'first_name': None, 'last_name': None,
+            'username': None, 'checked_at': time.time() - days_old * 86400}
+
+
+def test_ttl_only_filters_reads_until_purged(tmp_path):
+    store = ResultStore(path=str(tmp_path / 'results.sqlite3'), ttl_days=10)
+    store.put_many([record('+919876543210', 1), record('+919876543211', 20), record('+919876543212', 40)])
+    assert list(store.get_many(['+919876543210', '+919876543211'])) == ['+919876543210']
+    assert store.purge_expired(30) == 1
+    assert store.purge_expired() == 1
+    assert ResultStore(path=store.path, ttl_days=100).count_fresh(['+919876543211', '+919876543212']) == 0
+
+
+def test_first_store_of_the_process_purges_expired_rows(monkeypatch):
+    monkeypatch.setattr(store_module, '_stores', {})
+    monkeypatch.setattr(store_module, '_purged', False)
+    ResultStore().put_many([record('+919876543220', 1), record('+919876543221', RESULT_TTL_DAYS + 1)])
+    # A short TTL for one view does not delete rows the configured TTL still trusts
+    store = store_module.get_store(0)
+    assert ResultStore().count_fresh(['+919876543220', '+919876543221']) == 1
+    assert store_module.get_store(0) is store
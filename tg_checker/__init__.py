@@ -0,0 +1 @@
+"""Core pipeline for the Telegram Number Checker"""
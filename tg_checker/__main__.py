@@ -0,0 +1,6 @@
+"""``python -m tg_checker`` runs the command-line lookup"""
+import sys
+
+from tg_checker.cli import main
+
+sys.exit(main())
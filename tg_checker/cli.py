@@ -0,0 +1,186 @@
+"""Command-line lookup: tg-check input.xlsx [more.xlsx ...] --column "Mobile Number" --out results.parquet
+
+Runs the same pipeline as the Streamlit page without a browser. Only the
+standard library is imported up front; pandas, pyarrow and Telethon load
+when a run actually needs them, so ``--help`` and argument errors return
+immediately.
+"""
+import argparse
+import atexit
+import getpass
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+OUTPUT_KINDS = ('xlsx', 'csv', 'parquet')
+
+
+def log(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='tg-check',
+        description="Check which phone numbers in a sheet have Telegram accounts.",
+        epilog="An interrupted run resumes where it stopped when started again with the same input.",
+    )
+    parser.add_argument('input', nargs='+', help="Excel, CSV or Parquet files with phone numbers")
+    parser.add_argument('--all-sheets', action='store_true', help="Read every sheet of each workbook, not just the first")
+    parser.add_argument('--workers', type=int, help="Processes parsing files and sheets in parallel (env TG_INGEST_WORKERS)")
+    parser.add_argument('--column', required=True, help="Column holding the phone numbers")
+    parser.add_argument('--out', required=True, help="Output file; the format follows the extension (.xlsx, .csv, .parquet)")
+    parser.add_argument('--found-only', action='store_true', help="Write only the users found, not the whole sheet")
+    parser.add_argument('--country', default='IN', help="Default country for numbers without a country code")
+    parser.add_argument('--country-column', help="Column with a per-row ISO code or calling code")
+    parser.add_argument('--api-id', default=os.environ.get('TG_API_ID'), help="Telegram API ID (env TG_API_ID)")
+    parser.add_argument('--api-hash', default=os.environ.get('TG_API_HASH'), help="Telegram API hash (env TG_API_HASH)")
+    parser.add_argument('--phone', default=os.environ.get('TG_PHONE'), help="Operator phone number (env TG_PHONE)")
+    parser.add_argument('--batch-size', type=int, default=10, help="Numbers imported per request")
+    parser.add_argument('--delay', type=float, default=211, help="Seconds from the start of one batch to the next")
+    parser.add_argument('--ttl-days', type=float, help="Reuse stored results checked within this many days")
+    parser.add_argument('--no-cleanup', action='store_true', help="Keep the contacts imported during the run")
+    parser.add_argument('--restart', action='store_true', help="Ignore an interrupted run of this input")
+    parser.add_argument('--metrics-port', type=int, default=0, help="Serve Prometheus metrics on this local port")
+    parser.add_argument('--offline', action='store_true',
+                        help="Use the offline fake client instead of Telegram; nothing is stored or resumed")
+    args = parser.parse_args(argv)
+
+    kind = os.path.splitext(args.out)[1].lstrip('.').lower()
+    if kind not in OUTPUT_KINDS:
+        parser.error(f"--out must end in one of: {', '.join('.' + k for k in OUTPUT_KINDS)}")
+    args.kind = kind
+    if not args.offline and not (args.api_id and args.api_hash and args.phone):
+        parser.error("--api-id, --api-hash and --phone (or TG_API_ID, TG_API_HASH, TG_PHONE) are required")
+    return args
+
+
+async def login(client, phone):
+    """Connect with the stored session, asking for a code and password only when needed"""
+    from telethon.errors import SessionPasswordNeededError
+
+    from tg_checker import sessions
+
+    if await sessions.connect(client):
+        return
+    await client.send_code_request(phone)
+    code = input("Verification code sent to your Telegram app: ").strip()
+    try:
+        await client.sign_in(phone, code)
+    except SessionPasswordNeededError:
+        await client.sign_in(password=getpass.getpass("2FA password: "))
+
+
+def connect_client(args):
+    if args.offline:
+        from tg_checker.fake import FakeTelegramClient
+
+        return FakeTelegramClient()
+
+    from tg_checker import runner, sessions
+
+    client = sessions.get_client(args.phone, int(args.api_id), args.api_hash)
+    runner.get_runtime().run(login(client, args.phone))
+    sessions.save(args.phone, client, int(args.api_id), args.api_hash)
+    return client
+
+
+def run(args):
+    import pandas as pd
+
+    from tg_checker import metrics, runner
+    from tg_checker.dedup import dedup_numbers, join_results
+    from tg_checker.export import WRITERS
+    from tg_checker.journal import JobJournal, job_id_for
+    from tg_checker.lookup import find_users
+    from tg_checker.normalize import unpack_numbers
+    from tg_checker.parallel import list_parts, read_parts, read_parts_frame
+    from tg_checker.results import ResultTable
+    from tg_checker.sessions import session_key
+    from tg_checker.settings import INGEST_WORKERS, RESULT_TTL_DAYS
+    from tg_checker.store import ResultStore
+
+    metrics.serve(args.metrics_port)
+    started = time.monotonic()
+    parts = list_parts(args.input, all_sheets=args.all_sheets)
+    rows, normalized = read_parts(
+        parts, args.column, args.country, args.country_column, workers=args.workers or INGEST_WORKERS,
+        on_part=lambda done, total, rows_read: log(f"Parsing... {done}/{total} files and sheets done, {rows_read} rows read"),
+    )
+    # Numbers arrive packed; one dedup across every file and sheet
+    packed = dedup_numbers(normalized.numbers).unique
+    numbers = unpack_numbers(packed).to_pylist()
+    rejected = sum(normalized.rejected.values())
+    log(f"{rows} rows, {len(normalized.numbers)} valid numbers ({len(numbers)} unique), {rejected} skipped")
+    if not numbers:
+        log("Nothing to look up")
+        return 1
+
+    store_path = journal_root = None
+    if args.offline:
+        # The fake client's synthetic users must never reach the real result store or job journals
+        scratch = tempfile.mkdtemp(prefix='tg-offline-')
+        atexit.register(shutil.rmtree, scratch, True)
+        store_path, journal_root = os.path.join(scratch, 'results.sqlite3'), os.path.join(scratch, 'jobs')
+    store = ResultStore(store_path) if args.ttl_days is None else ResultStore(store_path, ttl_days=args.ttl_days)
+    # Rows past the configured TTL are never answered from again; a shorter --ttl-days keeps them for others
+    purged = store.purge_expired(max(store.ttl_days, RESULT_TTL_DAYS))
+    if purged:
+        log(f"Removed {purged} expired results from the store")
+    journal = JobJournal(job_id_for(packed, session_key(args.phone) if args.phone else ''), root=journal_root)
+    if args.restart or journal.is_finished():
+        journal.discard()
+    elif journal.exists():
+        done_batches, total_batches = journal.progress()
+        log(f"Resuming an interrupted run ({done_batches}/{total_batches} batches done)")
+
+    client = connect_client(args)
+
+    def on_batch(batch_num, total_batches, records):
+        found = sum(1 for r in records if r['found'])
+        log(f"Finished batch {batch_num}/{total_batches}: found {found} users")
+
+    def on_wait(remaining):
+        if remaining % 30 == 0:
+            log(f"Waiting {remaining} seconds before next batch...")
+
+    def on_error(batch_num, error):
+        log(f"Error in batch {batch_num}: {error}")
+
+    records = runner.get_runtime().run(find_users(
+        client, numbers, args.batch_size, args.delay, store, journal,
+        on_batch=on_batch, on_wait=on_wait, on_error=on_error, cleanup=not args.no_cleanup,
+    ))
+
+    if args.found_only:
+        table = ResultTable()
+        table.append(records)
+        frame = table.to_pandas()
+    else:
+        packed_rows = normalized.numbers
+        phones = pd.Series(pd.arrays.ArrowStringArray(unpack_numbers(packed_rows.to_numpy())), index=packed_rows.index)
+        frame = join_results(read_parts_frame(parts), phones, records)
+    with open(args.out, 'wb') as f:
+        WRITERS[args.kind](frame, f)
+    found = sum(1 for r in records if r['found'])
+    log(f"Found {found} Telegram users out of {len(numbers)} numbers in {time.monotonic() - started:.0f}s; "
+        f"wrote {len(frame)} rows to {args.out}")
+    return 0
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        return run(args)
+    except KeyboardInterrupt:
+        log("Interrupted; progress is saved and the next run resumes it")
+        return 130
+    except Exception as e:
+        log(f"Error: {str(e)}")
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
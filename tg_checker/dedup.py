@@ -0,0 +1,51 @@
+"""Order-preserving dedup of numbers and joining results back to source rows"""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+# ``unique`` holds each number once in first-seen order; ``codes[i]`` is the
+# position in ``unique`` of the number on source row ``rows[i]``
+Deduped = namedtuple('Deduped', ['unique', 'codes', 'rows'])
+
+RESULT_COLUMNS = ['normalized_phone', 'telegram_found', 'telegram_username', 'telegram_name']
+
+
+def dedup_numbers(numbers):
+    """Dedup a Series of numbers indexed by source row, keeping first-seen order.
+
+    Packed int64 numbers stay an int64 array; strings come back as objects.
+    """
+    codes, unique = pd.factorize(numbers, sort=False)
+    unique = np.asarray(unique)
+    return Deduped(unique if unique.dtype.kind == 'i' else unique.astype(object), codes, numbers.index)
+
+
+def results_frame(records):
+    """Lookup records as a DataFrame indexed by phone, one row per number"""
+    frame = pd.DataFrame.from_records(
+        records, columns=['phone', 'found', 'user_id', 'first_name', 'last_name', 'username']
+    )
+    return frame.drop_duplicates('phone', keep='last').set_index('phone')
+
+
+def join_results(frame, numbers, records):
+    """Add result columns to the uploaded ``frame``.
+
+    ``numbers`` maps source rows to normalized numbers and ``records`` are
+    lookup results. Rows that were invalid or not checked get missing values.
+    """
+    results = results_frame(records)
+    matched = results.reindex(numbers.to_numpy())
+    matched.index = numbers.index
+    matched = matched.reindex(frame.index)
+
+    found = matched['found'].astype('boolean')
+    name = (matched['first_name'].fillna('') + ' ' + matched['last_name'].fillna('')).str.strip()
+    extra = pd.DataFrame({
+        'normalized_phone': numbers.reindex(frame.index),
+        'telegram_found': found,
+        'telegram_username': matched['username'].where(found.fillna(False)),
+        'telegram_name': name.where(found.fillna(False)),
+    }, index=frame.index)
+    return pd.concat([frame.drop(columns=RESULT_COLUMNS, errors='ignore'), extra], axis=1)
@@ -0,0 +1,114 @@
+"""In-memory exports of result tables as Excel, CSV, Parquet or plain text
+
+Nothing touches the disk: each writer streams the frame into a BytesIO in
+chunks, so large result sets are never converted in one piece.
+"""
+import io
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Rows converted per write; bounds the memory of the intermediate copies
+CHUNK_ROWS = 50_000
+
+# Excel caps a sheet at 1,048,576 rows including the header
+EXCEL_MAX_ROWS = 1_048_575
+
+FORMATS = {
+    'xlsx': ('Excel', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'csv': ('CSV', 'text/csv'),
+    'parquet': ('Parquet', 'application/vnd.apache.parquet'),
+}
+
+# Formats for a single column rather than a table, so not offered in FORMATS
+LINE_FORMATS = {
+    'txt': ('Text', 'text/plain'),
+}
+
+
+def _chunks(frame, chunk_rows):
+    for start in range(0, len(frame), chunk_rows):
+        yield frame.iloc[start:start + chunk_rows]
+
+
+def write_csv(frame, buffer, chunk_rows=CHUNK_ROWS):
+    """Write ``frame`` as UTF-8 CSV, one chunk at a time"""
+    text = io.TextIOWrapper(buffer, encoding='utf-8', newline='', write_through=True)
+    try:
+        frame.iloc[:0].to_csv(text, index=False)
+        for chunk in _chunks(frame, chunk_rows):
+            chunk.to_csv(text, index=False, header=False)
+    finally:
+        # Leave ``buffer`` open for the caller
+        text.detach()
+
+
+def _arrow_safe(frame):
+    """Turn object columns that mix types (numbers and text, as sheets often do) into text"""
+    mixed = [c for c in frame.columns if frame[c].dtype == object
+             and pd.api.types.infer_dtype(frame[c], skipna=True).startswith('mixed')]
+    if not mixed:
+        return frame
+    frame = frame.copy()
+    for column in mixed:
+        values = frame[column]
+        frame[column] = values.where(values.isna(), values.astype(str))
+    return frame
+
+
+def write_parquet(frame, buffer, chunk_rows=CHUNK_ROWS):
+    """Write ``frame`` as Parquet with one row group per chunk"""
+    frame = _arrow_safe(frame)
+    schema = pa.Schema.from_pandas(frame, preserve_index=False)
+    with pq.ParquetWriter(buffer, schema) as writer:
+        for chunk in _chunks(frame, chunk_rows):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+
+def _cell(value):
+    # openpyxl cannot write NaN or pandas' missing-value markers
+    return None if pd.isna(value) else value
+
+
+def write_excel(frame, buffer, chunk_rows=CHUNK_ROWS):
+    """Write ``frame`` to a single-sheet workbook using openpyxl's write-only mode"""
+    from openpyxl import Workbook
+
+    if len(frame) > EXCEL_MAX_ROWS:
+        raise ValueError(f"{len(frame)} rows do not fit in an Excel sheet; export as CSV or Parquet instead")
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append([str(c) for c in frame.columns])
+    for chunk in _chunks(frame, chunk_rows):
+        for row in chunk.astype(object).itertuples(index=False, name=None):
+            sheet.append([_cell(v) for v in row])
+    workbook.save(buffer)
+
+
+def write_text(frame, buffer, chunk_rows=CHUNK_ROWS):
+    """Write the first column of ``frame`` as UTF-8 text, one value per line"""
+    for i, chunk in enumerate(_chunks(frame.iloc[:, 0], chunk_rows)):
+        buffer.write((('\n' if i else '') + '\n'.join(map(str, chunk))).encode('utf-8'))
+
+
+WRITERS = {'xlsx': write_excel, 'csv': write_csv, 'parquet': write_parquet, 'txt': write_text}
+
+
+def export_bytes(frame, kind):
+    """``frame`` rendered in format ``kind`` ('xlsx', 'csv', 'parquet' or 'txt')"""
+    buffer = io.BytesIO()
+    WRITERS[kind](frame, buffer)
+    return buffer.getvalue()
+
+
+def file_name(stem, kind):
+    return f"{stem}.{kind}"
+
+
+def format_label(kind):
+    return {**FORMATS, **LINE_FORMATS}[kind][0]
+
+
+def mime_type(kind):
+    return {**FORMATS, **LINE_FORMATS}[kind][1]
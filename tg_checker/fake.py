@@ -0,0 +1,103 @@
+"""Offline stand-in for TelegramClient, for tests and benchmarks
+
+It answers the contact requests the pipeline sends from a synthetic user
+directory: whether a number "has Telegram" is a stable function of the
+number and the seed, so repeated runs see the same users.
+"""
+import asyncio
+import hashlib
+import random
+
+from telethon.errors import FloodWaitError
+from telethon.tl.functions.contacts import DeleteContactsRequest, GetContactsRequest, ImportContactsRequest
+from telethon.tl.types import Contact, ImportedContact, User
+from telethon.tl.types.contacts import Contacts, ImportedContacts
+
+
+class FakeTelegramClient:
+    """Answers ImportContactsRequest, DeleteContactsRequest and GetContactsRequest.
+
+    ``hit_ratio`` is the share of numbers that belong to a user, ``latency``
+    the seconds each request takes, and ``flood_rate`` the chance that an
+    import raises ``FloodWaitError`` asking for ``flood_seconds``. For
+    scripted runs, ``errors`` are raised by the first imports in turn (None
+    lets that import through), and ``defer`` maps a number to how many of
+    its imports report it in ``retry_contacts`` instead of answering.
+    """
+
+    def __init__(self, hit_ratio=0.3, latency=0.0, flood_rate=0.0, flood_seconds=5, seed=0, contacts=(),
+                 errors=(), defer=None):
+        self.hit_ratio = hit_ratio
+        self.latency = latency
+        self.flood_rate = flood_rate
+        self.flood_seconds = flood_seconds
+        self.seed = seed
+        self.contacts = set(contacts)
+        self.errors = list(errors)
+        self.defer = dict(defer or {})
+        self.imports = 0
+        self.requests = 0
+        self.flood_waits = 0
+        self._random = random.Random(seed)
+        self._connected = False
+
+    def has_account(self, phone):
+        digest = hashlib.blake2b(f"{self.seed}:{phone}".encode(), digest_size=8).digest()
+        return int.from_bytes(digest, 'big') / 2 ** 64 < self.hit_ratio
+
+    def user_for(self, phone):
+        digits = phone.lstrip('+')
+        return User(
+            id=int(digits), access_hash=int(digits[::-1]), first_name='User', last_name=digits[-4:],
+            username=f"user{digits[-6:]}", phone=digits,
+        )
+
+    async def __call__(self, request):
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if isinstance(request, ImportContactsRequest):
+            return self._import(request)
+        if isinstance(request, DeleteContactsRequest):
+            self.contacts.difference_update(user.id for user in request.id)
+            return None
+        if isinstance(request, GetContactsRequest):
+            return Contacts(
+                contacts=[Contact(user_id=user_id, mutual=False) for user_id in sorted(self.contacts)],
+                saved_count=0, users=[],
+            )
+        raise NotImplementedError(type(request).__name__)
+
+    def _import(self, request):
+        self.imports += 1
+        error = self.errors.pop(0) if self.errors else None
+        if error is not None:
+            raise error
+        if self.flood_rate and self._random.random() < self.flood_rate:
+            self.flood_waits += 1
+            raise FloodWaitError(request, capture=self.flood_seconds)
+        imported, users, retry = [], [], []
+        for contact in request.contacts:
+            if self.defer.get(contact.phone):
+                self.defer[contact.phone] -= 1
+                retry.append(contact.client_id)
+            elif self.has_account(contact.phone):
+                user = self.user_for(contact.phone)
+                users.append(user)
+                imported.append(ImportedContact(user_id=user.id, client_id=contact.client_id))
+                self.contacts.add(user.id)
+        return ImportedContacts(imported=imported, popular_invites=[], retry_contacts=retry, users=users)
+
+    # The parts of the TelegramClient connection API the app uses
+
+    async def connect(self):
+        self._connected = True
+
+    async def disconnect(self):
+        self._connected = False
+
+    def is_connected(self):
+        return self._connected
+
+    async def is_user_authorized(self):
+        return True
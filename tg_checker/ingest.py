@@ -0,0 +1,208 @@
+"""Streaming readers that pull only the needed columns out of an upload
+
+Every reader yields DataFrame chunks whose index is the 0-based data row of
+the source file, so results can be joined back to the rows the user uploaded.
+"""
+import os
+import time
+
+import pandas as pd
+
+from tg_checker import metrics
+from tg_checker.normalize import DEFAULT_COUNTRY, Normalized, REJECT_REASONS, normalize_numbers
+
+CHUNK_ROWS = 50_000
+
+FILE_TYPES = ['xlsx', 'xls', 'csv', 'parquet']
+
+
+def file_kind(source):
+    """Lower-case extension of a path or uploaded file, without the dot"""
+    name = source if isinstance(source, (str, os.PathLike)) else getattr(source, 'name', '')
+    return os.path.splitext(str(name))[1].lstrip('.').lower()
+
+
+def _rewind(source):
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    return source
+
+
+def _header_names(values):
+    """Column labels the way pandas would name them"""
+    names, seen = [], {}
+    for i, value in enumerate(values):
+        name = f"Unnamed: {i}" if value is None else value
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _open_sheet(source, sheet=None):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(_rewind(source), read_only=True, data_only=True)
+    return workbook, workbook[sheet] if sheet is not None else workbook.worksheets[0]
+
+
+def _xlsx_columns(source, sheet=None):
+    workbook, sheet = _open_sheet(source, sheet)
+    try:
+        header = next(sheet.iter_rows(max_row=1, values_only=True), ())
+        return _header_names(header)
+    finally:
+        workbook.close()
+
+
+def _xlsx_chunks(source, columns, chunksize, limit=None, sheet=None):
+    workbook, sheet = _open_sheet(source, sheet)
+    try:
+        rows = sheet.iter_rows(values_only=True)
+        names = _header_names(next(rows, ()))
+        missing = [c for c in columns if c not in names]
+        if missing:
+            raise KeyError(f"Columns not found: {missing}")
+        positions = [names.index(c) for c in columns]
+        width = max(positions) + 1
+
+        buffer, start, blank = [], 0, 0
+        for row in rows:
+            if limit is not None and start + len(buffer) + blank >= limit:
+                break
+            row = tuple(row[:width]) + (None,) * (width - len(row))
+            # pandas drops trailing blank rows, so only keep blanks once data follows
+            if all(cell is None for cell in row):
+                blank += 1
+                continue
+            buffer.extend([(None,) * len(positions)] * blank)
+            blank = 0
+            buffer.append(tuple(row[p] for p in positions))
+            if len(buffer) >= chunksize:
+                yield pd.DataFrame(buffer, columns=columns, index=pd.RangeIndex(start, start + len(buffer)))
+                start += len(buffer)
+                buffer = []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=columns, index=pd.RangeIndex(start, start + len(buffer)))
+    finally:
+        workbook.close()
+
+
+def _parquet_file(source):
+    import pyarrow.parquet as pq
+
+    return pq.ParquetFile(_rewind(source))
+
+
+def list_sheets(source):
+    """Sheet names of a workbook; ``[None]`` for files that hold a single table"""
+    kind = file_kind(source)
+    if kind == 'xlsx':
+        workbook, _ = _open_sheet(source)
+        try:
+            return list(workbook.sheetnames)
+        finally:
+            workbook.close()
+    if kind == 'xls':
+        return list(pd.ExcelFile(_rewind(source)).sheet_names)
+    return [None]
+
+
+def list_columns(source, sheet=None):
+    """Header of ``sheet`` (the first by default) or the table, without reading the data"""
+    kind = file_kind(source)
+    if kind == 'xlsx':
+        return _xlsx_columns(source, sheet)
+    if kind == 'csv':
+        return pd.read_csv(_rewind(source), nrows=0).columns.tolist()
+    if kind == 'parquet':
+        return _parquet_file(source).schema_arrow.names
+    if kind == 'xls':
+        return pd.read_excel(_rewind(source), sheet_name=sheet or 0, nrows=0).columns.tolist()
+    raise ValueError(f"Unsupported file type: .{kind}")
+
+
+def iter_chunks(source, columns, chunksize=CHUNK_ROWS, limit=None, sheet=None):
+    """Yield DataFrames holding only ``columns``, ``chunksize`` rows at a time"""
+    columns = list(columns)
+    kind = file_kind(source)
+    if kind == 'xlsx':
+        yield from _xlsx_chunks(source, columns, chunksize, limit, sheet)
+    elif kind == 'csv':
+        reader = pd.read_csv(_rewind(source), usecols=columns, dtype=str, chunksize=chunksize, nrows=limit)
+        with reader:
+            for chunk in reader:
+                yield chunk[columns]
+    elif kind == 'parquet':
+        start = 0
+        for batch in _parquet_file(source).iter_batches(batch_size=chunksize, columns=columns):
+            if limit is not None:
+                batch = batch.slice(0, limit - start)
+            chunk = batch.to_pandas()
+            chunk.index = pd.RangeIndex(start, start + len(chunk))
+            start += len(chunk)
+            yield chunk
+            if limit is not None and start >= limit:
+                break
+    elif kind == 'xls':
+        # The legacy format has no streaming reader, so parse once and slice
+        df = pd.read_excel(_rewind(source), sheet_name=sheet or 0, usecols=columns, nrows=limit)
+        for start in range(0, len(df), chunksize):
+            yield df.iloc[start:start + chunksize][columns]
+    else:
+        raise ValueError(f"Unsupported file type: .{kind}")
+
+
+def preview(source, rows=5, sheet=None):
+    """First few rows of every column, for display"""
+    columns = list_columns(source, sheet)
+    return next(iter_chunks(source, columns, chunksize=rows, limit=rows, sheet=sheet), pd.DataFrame())
+
+
+def read_frame(source, chunksize=CHUNK_ROWS, sheet=None):
+    """Every column of the upload as one DataFrame, for joining results back"""
+    columns = list_columns(source, sheet)
+    chunks = list(iter_chunks(source, columns, chunksize, sheet=sheet))
+    return pd.concat(chunks) if chunks else pd.DataFrame(columns=columns)
+
+
+def iter_normalized(source, column, default_country=DEFAULT_COUNTRY, country_column=None, chunksize=CHUNK_ROWS,
+                    sheet=None):
+    """Stream ``column`` and normalize it chunk by chunk.
+
+    Yields ``(rows_read, Normalized)`` so callers can use the first numbers
+    while the rest of the file is still being parsed.
+    """
+    columns = [column] if not country_column or country_column == column else [column, country_column]
+    rows_read = 0
+    for chunk in iter_chunks(source, columns, chunksize, sheet=sheet):
+        rows_read += len(chunk)
+        countries = chunk[country_column] if country_column else None
+        yield rows_read, normalize_numbers(chunk[column], default_country, countries)
+
+
+def collect_normalized(chunks, on_chunk=None):
+    """Concatenate what ``iter_normalized`` yields; returns ``(rows_read, Normalized)``"""
+    parts, rejected, rows_read, kept = [], dict.fromkeys(REJECT_REASONS, 0), 0, 0
+    for rows_read, normalized in chunks:
+        parts.append(normalized.numbers)
+        kept += len(normalized.numbers)
+        for reason, count in normalized.rejected.items():
+            rejected[reason] += count
+        if on_chunk:
+            on_chunk(rows_read, kept)
+    numbers = pd.concat(parts) if parts else pd.Series([], dtype='string[pyarrow]')
+    return rows_read, Normalized(numbers, rejected)
+
+
+def read_normalized(source, column, default_country=DEFAULT_COUNTRY, country_column=None, chunksize=CHUNK_ROWS,
+                    on_chunk=None, sheet=None):
+    """Normalize a whole upload, or one sheet of it; returns ``(rows_read, Normalized)``"""
+    started = time.perf_counter()
+    chunks = iter_normalized(source, column, default_country, country_column, chunksize, sheet)
+    rows_read, normalized = collect_normalized(chunks, on_chunk)
+    metrics.record_parse(rows_read, len(normalized.numbers), time.perf_counter() - started)
+    return rows_read, normalized
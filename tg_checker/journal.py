@@ -0,0 +1,227 @@
+"""On-disk journal of lookup jobs so interrupted runs can resume"""
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+from tg_checker.normalize import unpack_numbers
+from tg_checker.settings import DATA_DIR, JOB_MAX_AGE_DAYS
+
+# Batch number under which records answered by the result store are journaled
+CACHED_BATCH = 0
+
+# Packed numbers formatted at a time while hashing
+_HASH_CHUNK = 100_000
+
+
+def job_id_for(numbers, operator=''):
+    """Stable id for ``operator``'s lookup of ``numbers``, given as E.164 strings or packed int64.
+
+    Two operators checking the same list get separate jobs and journals.
+    """
+    digest = hashlib.sha256()
+    if isinstance(numbers, np.ndarray) and numbers.dtype.kind == 'i':
+        # Same digest as the strings, formatted a chunk at a time
+        for start in range(0, len(numbers), _HASH_CHUNK):
+            text = unpack_numbers(numbers[start:start + _HASH_CHUNK]).to_pylist()
+            digest.update(''.join(number + '\n' for number in text).encode())
+    else:
+        for number in numbers:
+            digest.update(number.encode())
+            digest.update(b'\n')
+    if operator:
+        digest.update(f"operator:{operator}".encode())
+    return digest.hexdigest()[:16]
+
+
+class JobJournal:
+    """Append-only record of a job's batch plan and every finished batch.
+
+    ``meta.json`` holds the settings and status, ``pending.txt`` the numbers
+    that still needed a lookup when the job started, and ``batches.jsonl`` one
+    line per finished batch. Batch ``n`` covers ``pending[(n-1)*size:n*size]``;
+    numbers the server asked to retry are carried on their batch's line as a
+    new batch numbered after the planned ones.
+    """
+
+    def __init__(self, job_id, root=None):
+        self.job_id = job_id
+        self.path = os.path.join(root or os.path.join(DATA_DIR, 'jobs'), job_id)
+        self._meta = None
+
+    @classmethod
+    def for_numbers(cls, numbers, operator='', root=None):
+        return cls(job_id_for(numbers, operator), root)
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def exists(self):
+        return os.path.exists(self._file('meta.json'))
+
+    @property
+    def meta(self):
+        if self._meta is None:
+            with open(self._file('meta.json'), encoding='utf-8') as f:
+                self._meta = json.load(f)
+        return self._meta
+
+    def _write_meta(self, **changes):
+        meta = {**(self._meta or {}), **changes}
+        tmp = self._file('meta.json.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._file('meta.json'))
+        self._meta = meta
+
+    def start(self, batch_size, total, cached_records, pending):
+        """Create the journal for a new job, first deleting journals left idle too long"""
+        cleanup_stale(root=os.path.dirname(self.path), keep=(self.job_id,))
+        os.makedirs(self.path, exist_ok=True)
+        with open(self._file('pending.txt'), 'w', encoding='utf-8') as f:
+            f.write('\n'.join(pending))
+        open(self._file('batches.jsonl'), 'w').close()
+        self._write_meta(
+            job_id=self.job_id, batch_size=batch_size, total=total, pending=len(pending),
+            status='running', created_at=time.time(), updated_at=time.time(), done_batches=0, requeued_batches=0,
+        )
+        self.record_batch(CACHED_BATCH, cached_records)
+
+    def save_contacts(self, user_ids):
+        """Record the account's contacts from before the job's first import"""
+        tmp = self._file('contacts.json.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(sorted(user_ids), f)
+        os.replace(tmp, self._file('contacts.json'))
+
+    def contacts(self):
+        """User ids saved by ``save_contacts``, or None when not saved"""
+        if not os.path.exists(self._file('contacts.json')):
+            return None
+        with open(self._file('contacts.json'), encoding='utf-8') as f:
+            return set(json.load(f))
+
+    def pending(self):
+        with open(self._file('pending.txt'), encoding='utf-8') as f:
+            return f.read().split('\n') if self.meta['pending'] else []
+
+    def total_batches(self):
+        size = self.meta['batch_size']
+        return (self.meta['pending'] + size - 1) // size
+
+    def record_batch(self, batch_num, records, requeued=None):
+        """Durably append a finished batch, and the ``(batch_num, numbers)`` it requeued"""
+        entry = {'batch': batch_num, 'records': records}
+        if requeued:
+            entry['requeued'] = list(requeued)
+        line = json.dumps(entry, separators=(',', ':'))
+        with open(self._file('batches.jsonl'), 'ab+') as f:
+            # Terminate a torn line left by a crash so it cannot swallow this one
+            if f.seek(0, os.SEEK_END):
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    f.write(b'\n')
+            f.write(line.encode('utf-8') + b'\n')
+            f.flush()
+            os.fsync(f.fileno())
+        if batch_num != CACHED_BATCH and 'done_batches' in self.meta:
+            # Counted in meta.json so progress() never has to parse the batches
+            self._write_meta(done_batches=self.meta['done_batches'] + 1,
+                             requeued_batches=self.meta['requeued_batches'] + bool(requeued))
+
+    def _entries(self):
+        with open(self._file('batches.jsonl'), encoding='utf-8') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # A crash mid-write leaves a torn last line; that batch simply reruns
+                    continue
+
+    def completed(self):
+        """Finished batches as ``{batch_num: records}``"""
+        return {entry['batch']: entry['records'] for entry in self._entries()}
+
+    def requeued(self):
+        """Batches added for numbers the server asked to retry, as ``{batch_num: numbers}``"""
+        return dict(entry['requeued'] for entry in self._entries() if 'requeued' in entry)
+
+    def read_batches(self, offset=0):
+        """Batches appended since byte ``offset``; returns ``([(batch_num, records)], next offset)``.
+
+        Only complete lines are returned, so a batch being written right now
+        is picked up by the next call.
+        """
+        batches = []
+        with open(self._file('batches.jsonl'), 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                offset += len(line)
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                batches.append((entry['batch'], entry['records']))
+        return batches, offset
+
+    def records(self):
+        """Every journaled record, cached ones first"""
+        return [r for _, records in sorted(self.completed().items()) for r in records]
+
+    def progress(self):
+        """``(finished lookup batches, total lookup batches)``, requeued ones included"""
+        if 'done_batches' in self.meta:
+            return self.meta['done_batches'], self.total_batches() + self.meta['requeued_batches']
+        # Journals written before the counters were kept
+        done = sum(1 for batch in self.completed() if batch != CACHED_BATCH)
+        return done, self.total_batches() + len(self.requeued())
+
+    def finish(self):
+        self._write_meta(status='done', updated_at=time.time())
+
+    def is_finished(self):
+        return self.exists() and self.meta['status'] == 'done'
+
+    def discard(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+        self._meta = None
+
+
+def last_written(path):
+    """When a journal directory or any file in it was last written"""
+    times = [os.path.getmtime(path)]
+    for name in os.listdir(path):
+        times.append(os.path.getmtime(os.path.join(path, name)))
+    return max(times)
+
+
+def cleanup_stale(max_age_days=JOB_MAX_AGE_DAYS, root=None, keep=()):
+    """Delete journals not written to for ``max_age_days``; returns the removed job ids.
+
+    Finished journals only back the results view by then. An interrupted one
+    idle that long is dropped too: its finished batches are in the result
+    store, so starting the list again queries only what is left.
+    """
+    root = root or os.path.join(DATA_DIR, 'jobs')
+    if not os.path.isdir(root):
+        return []
+    cutoff = time.time() - max_age_days * 86400
+    removed = []
+    for job_id in os.listdir(root):
+        path = os.path.join(root, job_id)
+        if job_id in keep or not os.path.isdir(path):
+            continue
+        try:
+            stale = last_written(path) < cutoff
+        except OSError:
+            # Removed by another process meanwhile
+            continue
+        if stale:
+            shutil.rmtree(path, ignore_errors=True)
+            removed.append(job_id)
+    return removed
@@ -0,0 +1,218 @@
+"""Batched Telegram lookups through ImportContactsRequest"""
+import asyncio
+import time
+
+from telethon.errors import FloodWaitError
+from telethon.tl.functions.contacts import DeleteContactsRequest, GetContactsRequest, ImportContactsRequest
+from telethon.tl.types import InputPhoneContact
+
+from tg_checker import metrics
+from tg_checker.journal import CACHED_BATCH
+from tg_checker.scheduler import BatchScheduler
+
+
+def user_record(phone, user=None):
+    """Result row for one looked-up number; ``user`` is None when not on Telegram"""
+    if user is None:
+        return {'phone': phone, 'found': False, 'user_id': None,
+                'first_name': '', 'last_name': '', 'username': ''}
+    return {
+        'phone': phone,
+        'found': True,
+        'user_id': user.id,
+        'first_name': user.first_name or '',
+        'last_name': user.last_name or '',
+        'username': user.username or '',
+    }
+
+
+def found_user(record):
+    """The user dict shown in the results table"""
+    return {key: record[key] for key in ('first_name', 'last_name', 'username', 'phone')}
+
+
+async def lookup_batch(client, batch):
+    """Import one batch of numbers; returns ``(records, imported users, numbers to retry)``.
+
+    Numbers Telegram asked us to retry are left out of the records, so they
+    are never recorded as not found.
+    """
+    contacts = [
+        InputPhoneContact(client_id=j, phone=number, first_name='A', last_name='')
+        for j, number in enumerate(batch)
+    ]
+    result = await client(ImportContactsRequest(contacts))
+
+    users = {user.id: user for user in result.users}
+    matched = {imported.client_id: users.get(imported.user_id) for imported in result.imported}
+    retry = set(result.retry_contacts)
+    records = [user_record(number, matched.get(j)) for j, number in enumerate(batch) if j not in retry]
+    users = [user for user in matched.values() if user is not None]
+    return records, users, [number for j, number in enumerate(batch) if j in retry]
+
+
+async def existing_contact_ids(client):
+    """Ids of the account's own contacts, which cleanup must never delete"""
+    result = await client(GetContactsRequest(hash=0))
+    return {contact.user_id for contact in getattr(result, 'contacts', [])}
+
+
+async def delete_contacts(client, users, chunk_size=100):
+    """Remove contacts added by our imports, ``chunk_size`` per request"""
+    for i in range(0, len(users), chunk_size):
+        await client(DeleteContactsRequest(id=users[i:i + chunk_size]))
+
+
+def _uncancelled(coro):
+    """Await ``coro`` without letting a cancelled job interrupt it halfway.
+
+    A batch whose import went out still gets its contacts deleted; the job
+    itself stops as soon as the caller is cancelled.
+    """
+    task = asyncio.ensure_future(coro)
+    # Nobody awaits the task after a cancel, so collect its error here
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    return asyncio.shield(task)
+
+
+async def find_users(client, numbers, batch_size=10, delay=211, store=None, journal=None,
+                     on_batch=None, on_wait=None, on_error=None, checkpoint=None, on_stats=None,
+                     on_cleanup=None, scheduler=None, cleanup=True):
+    """Look up ``numbers`` in batches, skipping those already in ``store``.
+
+    With a ``journal`` every finished batch is written to disk, and a journal
+    that already exists is resumed from its last finished batch instead of
+    starting over. Batches start at least ``delay`` seconds apart; flood
+    waits and retries are handled by the ``BatchScheduler``; numbers Telegram
+    asks to retry are queued again as a batch of their own. With ``cleanup``
+    the contacts each batch imported are deleted again right after it, except
+    for users who were already in the account's contacts before the job's
+    first batch; that set is journaled and reused when the job resumes.
+    A batch cancelled mid-request still finishes its cleanup.
+
+    Callbacks: ``on_batch(batch_num, total_batches, records)`` after each
+    batch, ``on_wait(seconds_left)`` about once a second while waiting,
+    ``on_error(batch_num, exc)`` when a batch or its cleanup fails,
+    ``on_cleanup(batch_num, count)`` before contacts are deleted and
+    ``on_stats(stats)`` with the scheduler's timing totals. ``checkpoint()``
+    is awaited before every batch and every second of waiting, which lets a
+    caller pause the run. Returns every record, cached and new, in input
+    order.
+    """
+    requeued = {}
+    if journal is not None and journal.exists():
+        batch_size = journal.meta['batch_size']
+        pending, done, requeued = journal.pending(), journal.completed(), journal.requeued()
+    else:
+        cached, pending = store.partition(numbers) if store else ({}, list(numbers))
+        if store:
+            metrics.record_store(len(cached), len(pending))
+        done = {CACHED_BATCH: list(cached.values())}
+        if journal is not None:
+            journal.start(batch_size, len(numbers), done[CACHED_BATCH], pending)
+    total_batches = (len(pending) + batch_size - 1) // batch_size
+
+    if scheduler is None:
+        scheduler = BatchScheduler(interval=delay)
+    for i in range(0, len(pending), batch_size):
+        batch_num = i // batch_size + 1
+        if batch_num not in done:
+            scheduler.add(batch_num, pending[i:i + batch_size])
+    for batch_num, batch in sorted(requeued.items()):
+        if batch_num not in done:
+            scheduler.add(batch_num, batch)
+    # Every batch that must finish before the job is done
+    planned = set(range(1, total_batches + 1)) | set(requeued)
+
+    job_started, looked_up = time.perf_counter(), 0
+    keep = journal.contacts() if journal is not None else None
+    if cleanup and len(scheduler) and keep is None:
+        # Taken before this job's first import and journaled, so a resumed run
+        # does not mistake placeholders left by an interrupted batch for the user's own
+        keep = await existing_contact_ids(client)
+        if journal is not None:
+            journal.save_contacts(keep)
+    keep = keep or set()
+    leftover = []
+
+    async def remove(batch_num, users):
+        users = [user for user in users if user.id not in keep]
+        if not users:
+            return
+        if on_cleanup:
+            on_cleanup(batch_num, len(users))
+        started = scheduler.clock()
+        try:
+            await delete_contacts(client, users)
+            scheduler.stats['contacts_deleted'] += len(users)
+        except Exception as e:
+            leftover.extend(users)
+            if on_error:
+                on_error(batch_num, e)
+        finally:
+            scheduler.stats['cleanup_seconds'] += scheduler.clock() - started
+
+    async def run_batch(batch_num, batch):
+        started = time.perf_counter()
+        records, imported, retry = await lookup_batch(client, batch)
+        rpc_seconds = time.perf_counter() - started
+        if cleanup:
+            await remove(batch_num, imported)
+        return records, retry, rpc_seconds
+
+    try:
+        while True:
+            item = await scheduler.next_batch(on_wait, checkpoint)
+            if item is None:
+                break
+            batch_num, batch = item
+            rpc_started = time.perf_counter()
+            try:
+                records, retry, rpc_seconds = await _uncancelled(run_batch(batch_num, batch))
+            except FloodWaitError as e:
+                scheduler.flood_wait(batch_num, batch, e.seconds)
+                records, error = None, e
+            except Exception as e:
+                scheduler.retry(batch_num, batch)
+                records, error = None, e
+
+            if records is None:
+                rpc_seconds = time.perf_counter() - rpc_started
+                metrics.record_error(batch_num, error, rpc_seconds)
+                if on_error:
+                    on_error(batch_num, error)
+            else:
+                requeue = None
+                if retry:
+                    # Telegram deferred these numbers; they get a batch of their own after a backoff
+                    requeue = (max(planned) + 1, retry)
+                    planned.add(requeue[0])
+                    scheduler.requeue(batch_num, *requeue)
+                scheduler.done(batch_num)
+                metrics.record_batch(batch_num, len(batch), sum(1 for r in records if r['found']), rpc_seconds)
+                looked_up += len(records)
+                if store:
+                    store.put_many(records)
+                if journal is not None:
+                    journal.record_batch(batch_num, records, requeue)
+                done[batch_num] = records
+                if on_batch:
+                    on_batch(batch_num, len(planned), records)
+            if on_stats:
+                on_stats(dict(scheduler.stats))
+    finally:
+        # One more pass for contacts whose deletion failed along the way, even when cancelled
+        if leftover:
+            users, leftover = leftover, []
+            await _uncancelled(remove(max(planned, default=0), users))
+            if on_stats:
+                on_stats(dict(scheduler.stats))
+
+    metrics.record_job(looked_up, time.perf_counter() - job_started, scheduler.stats)
+
+    # Batches that ran out of retries keep the job open so the next run retries just those
+    if journal is not None and planned <= set(done):
+        journal.finish()
+
+    results = {r['phone']: r for records in done.values() for r in records}
+    return [results[n] for n in numbers if n in results]
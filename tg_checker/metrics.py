@@ -0,0 +1,247 @@
+"""Performance metrics for lookup runs: JSON event logs and a Prometheus endpoint
+
+The hot paths call the ``record_*`` functions below. Each call updates the
+process-wide counters and histograms, which ``serve()`` exposes in Prometheus
+text format on a local port, and writes one JSON line to the metrics log.
+Only the standard library is used, so the CLI stays quick to start.
+"""
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging.handlers import RotatingFileHandler
+
+from tg_checker.settings import METRICS_LOG, METRICS_PORT, data_path
+
+# Upper bounds in seconds for the latency histograms
+RPC_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+PARSE_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60)
+
+logger = logging.getLogger('tg_checker.metrics')
+
+
+class Metric:
+    """A counter or gauge, optionally split by label values"""
+
+    def __init__(self, name, help, kind='counter', labels=()):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labels = labels
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(label, '') for label in self.labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def set(self, value, **labels):
+        key = tuple(labels.get(label, '') for label in self.labels)
+        with self._lock:
+            self.values[key] = value
+
+    def get(self, **labels):
+        return self.values.get(tuple(labels.get(label, '') for label in self.labels), 0)
+
+    def _label_text(self, key):
+        pairs = list(zip(self.labels, key))
+        return '{' + ','.join(f'{k}="{v}"' for k, v in pairs) + '}' if pairs else ''
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            values = sorted(self.values.items())
+        if not values and not self.labels:
+            values = [((), 0)]
+        lines += [f"{self.name}{self._label_text(key)} {value}" for key, value in values]
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram of observed durations"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, buckets):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.count += 1
+            self.sum += value
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+
+    def mean(self):
+        return self.sum / self.count if self.count else 0.0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for bound, count in zip(self.buckets, self.counts):
+                lines.append(f'{self.name}_bucket{{le="{bound}"}} {count}')
+            lines += [f'{self.name}_bucket{{le="+Inf"}} {self.count}', f"{self.name}_sum {self.sum}",
+                      f"{self.name}_count {self.count}"]
+        return lines
+
+
+RPC_SECONDS = Histogram('tg_lookup_rpc_seconds', "Latency of one contact import request", RPC_BUCKETS)
+BATCHES = Metric('tg_lookup_batches_total', "Lookup batches finished")
+NUMBERS = Metric('tg_lookup_numbers_total', "Numbers looked up on Telegram")
+FOUND = Metric('tg_lookup_found_total', "Numbers that belong to a Telegram user")
+FLOOD_WAITS = Metric('tg_lookup_flood_waits_total', "Flood waits requested by Telegram")
+ERRORS = Metric('tg_lookup_errors_total', "Failed lookup batches, before retries")
+WAIT_SECONDS = Metric('tg_lookup_wait_seconds_total', "Time spent waiting between batches", labels=('reason',))
+NUMBERS_PER_SECOND = Metric('tg_lookup_numbers_per_second', "Throughput of the last finished job", kind='gauge')
+PARSE_SECONDS = Histogram('tg_parse_seconds', "Time to read and normalize one upload", PARSE_BUCKETS)
+PARSE_ROWS = Metric('tg_parse_rows_total', "Rows read from uploads")
+STORE_LOOKUPS = Metric('tg_store_lookups_total', "Result store lookups by outcome", labels=('result',))
+
+REGISTRY = [RPC_SECONDS, BATCHES, NUMBERS, FOUND, FLOOD_WAITS, ERRORS, WAIT_SECONDS, NUMBERS_PER_SECOND,
+            PARSE_SECONDS, PARSE_ROWS, STORE_LOOKUPS]
+
+
+def render():
+    """Every metric in Prometheus text exposition format"""
+    return '\n'.join(line for metric in REGISTRY for line in metric.render()) + '\n'
+
+
+# JSON event log
+
+_configured = False
+_config_lock = threading.Lock()
+
+
+def _configure_logging():
+    global _configured
+    with _config_lock:
+        if _configured:
+            return
+        _configured = True
+        if METRICS_LOG:
+            path = METRICS_LOG if METRICS_LOG != 'default' else data_path('metrics.jsonl')
+            handler = logging.StreamHandler() if path == '-' else RotatingFileHandler(
+                path, maxBytes=10 * 1024 * 1024, backupCount=3, encoding='utf-8'
+            )
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+
+
+def emit(event, **fields):
+    """Write one JSON line for ``event``"""
+    _configure_logging()
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps({'ts': round(time.time(), 3), 'event': event, **fields}, default=str))
+
+
+# Hooks for the hot paths
+
+def record_parse(rows, kept, seconds):
+    PARSE_SECONDS.observe(seconds)
+    PARSE_ROWS.inc(rows)
+    emit('parse', rows=rows, valid=kept, seconds=round(seconds, 4),
+         rows_per_second=round(rows / seconds) if seconds else None)
+
+
+def record_store(hits, misses):
+    STORE_LOOKUPS.inc(hits, result='hit')
+    STORE_LOOKUPS.inc(misses, result='miss')
+    total = hits + misses
+    emit('store', hits=hits, misses=misses, hit_rate=round(hits / total, 4) if total else None)
+
+
+def record_batch(batch_num, size, found, seconds):
+    RPC_SECONDS.observe(seconds)
+    BATCHES.inc()
+    NUMBERS.inc(size)
+    FOUND.inc(found)
+    emit('batch', batch=batch_num, size=size, found=found, rpc_seconds=round(seconds, 4))
+
+
+def record_error(batch_num, error, seconds):
+    if getattr(error, 'seconds', None) is not None:
+        FLOOD_WAITS.inc()
+        emit('flood_wait', batch=batch_num, wait_seconds=error.seconds, rpc_seconds=round(seconds, 4))
+    else:
+        ERRORS.inc()
+        emit('batch_error', batch=batch_num, error=str(error), rpc_seconds=round(seconds, 4))
+
+
+def record_wait(reason, seconds):
+    WAIT_SECONDS.inc(seconds, reason=reason)
+
+
+def record_job(numbers, seconds, stats):
+    rate = numbers / seconds if seconds else 0.0
+    NUMBERS_PER_SECOND.set(round(rate, 3))
+    emit('job', numbers=numbers, seconds=round(seconds, 3), numbers_per_second=round(rate, 3), **stats)
+
+
+def summary():
+    """Headline numbers for the UI panel"""
+    hits, misses = STORE_LOOKUPS.get(result='hit'), STORE_LOOKUPS.get(result='miss')
+    return {
+        'batches': BATCHES.get(),
+        'numbers': NUMBERS.get(),
+        'rpc_mean_seconds': RPC_SECONDS.mean(),
+        'numbers_per_second': NUMBERS_PER_SECOND.get(),
+        'flood_waits': FLOOD_WAITS.get(),
+        'flood_wait_seconds': WAIT_SECONDS.get(reason='flood_wait'),
+        'pacing_seconds': WAIT_SECONDS.get(reason='pacing'),
+        'backoff_seconds': WAIT_SECONDS.get(reason='backoff'),
+        'parse_mean_seconds': PARSE_SECONDS.mean(),
+        'parse_rows': PARSE_ROWS.get(),
+        'store_hit_rate': hits / (hits + misses) if hits + misses else None,
+    }
+
+
+# Prometheus endpoint
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+
+
+def serve(port=METRICS_PORT, host='127.0.0.1'):
+    """Serve /metrics on ``host:port`` from a daemon thread, once per process.
+
+    Returns the server, or None when disabled (port 0) or the port is taken,
+    e.g. by another app process that already serves it.
+    """
+    global _server
+    with _config_lock:
+        if _server is not None or not port:
+            return _server
+        try:
+            _server = ThreadingHTTPServer((host, port), _Handler)
+        except OSError as e:
+            emit('metrics_server_error', port=port, error=str(e))
+            return None
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name='tg-checker-metrics', daemon=True).start()
+        return _server
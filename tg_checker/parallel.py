@@ -0,0 +1,267 @@
+"""Parse several files and sheets at once in a pool of worker processes
+
+A part is one sheet of a workbook, or a whole CSV or Parquet file. Each part
+is read and normalized in its own worker process, which sends back only the
+packed int64 numbers and their source rows, so the parse scales with the
+number of cores and little data crosses between processes. Uploads are
+written to a temporary file once, so workers open them by path instead of
+each task carrying the bytes. The parts are then merged in upload order,
+ready to be deduplicated as one list. The pool is stopped once it has been
+idle for INGEST_IDLE_SECONDS.
+"""
+import io
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+
+from tg_checker import metrics
+from tg_checker.ingest import collect_normalized, iter_normalized, list_sheets, read_frame
+from tg_checker.normalize import DEFAULT_COUNTRY, Normalized, REJECT_REASONS, pack_numbers
+from tg_checker.settings import INGEST_IDLE_SECONDS, INGEST_WORKERS
+
+# ``source`` is a path or uploaded file; ``sheet`` is None for single-table files
+Part = namedtuple('Part', ['source', 'sheet'])
+
+# What a worker sends back: packed numbers and the 0-based data row of each
+PartResult = namedtuple('PartResult', ['rows_read', 'numbers', 'rows', 'rejected'])
+
+_pool = None
+_pool_workers = 0
+_pool_users = 0
+_idle_timer = None
+_pool_lock = threading.Lock()
+
+
+def source_name(source):
+    """File name of a path or uploaded file"""
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.basename(os.fspath(source))
+    return getattr(source, 'name', '')
+
+
+def part_label(part):
+    """``file.xlsx / Sheet1`` for workbook sheets, the file name otherwise"""
+    name = source_name(part.source)
+    return name if part.sheet is None else f"{name} / {part.sheet}"
+
+
+def list_parts(sources, all_sheets=True):
+    """Every sheet of every source in order, or only the first sheet of each workbook"""
+    parts = []
+    for source in sources:
+        sheets = list_sheets(source)
+        parts += [Part(source, sheet) for sheet in (sheets if all_sheets else sheets[:1])]
+    return parts
+
+
+def _payload(source):
+    """What a worker needs to reopen ``source``: its path, or an upload's name and bytes"""
+    if isinstance(source, (str, os.PathLike)):
+        return os.fspath(source)
+    if hasattr(source, 'getvalue'):
+        return source_name(source), source.getvalue()
+    source.seek(0)
+    data = source.read()
+    source.seek(0)
+    return source_name(source), data
+
+
+def _open_payload(payload):
+    if isinstance(payload, str):
+        return payload
+    name, data = payload
+    source = io.BytesIO(data)
+    source.name = name
+    return source
+
+
+def _spool(source, directory):
+    """A path workers can open ``source`` from: its own, or a file in ``directory`` holding the upload"""
+    payload = _payload(source)
+    if isinstance(payload, str):
+        return payload
+    name, data = payload
+    # Keep the extension, which tells the readers the file format
+    fd, path = tempfile.mkstemp(suffix=os.path.splitext(name)[1], dir=directory)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    return path
+
+
+def _normalize_part(payload, sheet, column, default_country, country_column):
+    """Worker entry point: read and normalize one part"""
+    source = _open_payload(payload)
+    chunks = iter_normalized(source, column, default_country, country_column, sheet=sheet)
+    rows_read, normalized = collect_normalized(chunks)
+    numbers = normalized.numbers
+    return PartResult(rows_read, pack_numbers(numbers), numbers.index.to_numpy(dtype=np.int64), normalized.rejected)
+
+
+def get_pool(workers=INGEST_WORKERS):
+    """Lease the process-wide worker pool, starting it if needed; pair with ``release_pool``"""
+    global _pool, _pool_workers, _pool_users, _idle_timer
+    with _pool_lock:
+        if _idle_timer is not None:
+            _idle_timer.cancel()
+            _idle_timer = None
+        if _pool is None or (_pool_workers != workers and not _pool_users):
+            if _pool is not None:
+                _pool.shutdown(wait=False, cancel_futures=True)
+            # Spawn rather than fork: the app process runs threads (Streamlit, the Telethon loop)
+            _pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+            _pool_workers = workers
+        # Counted under the same lock, so a lease ending elsewhere cannot shut this pool down
+        _pool_users += 1
+        return _pool
+
+
+def _shutdown_locked():
+    global _pool, _idle_timer
+    if _idle_timer is not None:
+        _idle_timer.cancel()
+        _idle_timer = None
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def shutdown_pool():
+    """Stop the worker processes; the next parallel parse starts new ones"""
+    with _pool_lock:
+        _shutdown_locked()
+
+
+def _shutdown_if_idle(timer):
+    with _pool_lock:
+        # A parse that started meanwhile cancelled or replaced this timer
+        if _idle_timer is timer and not _pool_users:
+            _shutdown_locked()
+
+
+def release_pool(idle_seconds=None):
+    """End a lease; once no parse uses the pool, it stops after ``idle_seconds``"""
+    global _pool_users, _idle_timer
+    idle_seconds = INGEST_IDLE_SECONDS if idle_seconds is None else idle_seconds
+    with _pool_lock:
+        _pool_users -= 1
+        if _pool_users:
+            return
+        if idle_seconds <= 0:
+            _shutdown_locked()
+            return
+        if _idle_timer is not None:
+            _idle_timer.cancel()
+        timer = _idle_timer = threading.Timer(idle_seconds, lambda: _shutdown_if_idle(timer))
+        timer.daemon = True
+        timer.start()
+
+
+@contextmanager
+def leased_pool(workers=INGEST_WORKERS, idle_seconds=None):
+    """The worker pool for one parse; once no parse uses it, it stops after ``idle_seconds``"""
+    pool = get_pool(workers)
+    try:
+        yield pool
+    finally:
+        release_pool(idle_seconds)
+
+
+def merge_parts(results):
+    """Join per-part results in part order; returns ``(rows_read, Normalized)``"""
+    rejected = dict.fromkeys(REJECT_REASONS, 0)
+    for result in results:
+        for reason, count in result.rejected.items():
+            rejected[reason] += count
+    lengths = [len(result.numbers) for result in results]
+    numbers = np.concatenate([result.numbers for result in results]) if results else np.empty(0, dtype=np.int64)
+    rows = np.concatenate([result.rows for result in results]) if results else np.empty(0, dtype=np.int64)
+    index = pd.MultiIndex.from_arrays(
+        [np.repeat(np.arange(len(results), dtype=np.int64), lengths), rows], names=['part', 'row']
+    )
+    return sum(result.rows_read for result in results), Normalized(pd.Series(numbers, index=index), rejected)
+
+
+def read_parts(parts, column, default_country=DEFAULT_COUNTRY, country_column=None, workers=INGEST_WORKERS,
+               on_part=None):
+    """Normalize every part, in worker processes when there are several.
+
+    Returns ``(rows_read, Normalized)`` whose numbers are packed int64 and
+    indexed by ``(part, row)``: the position in ``parts`` and the 0-based
+    data row. Numbers repeated across parts are kept; dedup the merged
+    Series once. ``on_part(done, total, rows_read)`` runs as parts finish.
+    """
+    started = time.perf_counter()
+    tasks = [(part.sheet, column, default_country, country_column) for part in parts]
+    results = [None] * len(tasks)
+    rows_read = 0
+
+    def finish(i, result):
+        nonlocal rows_read
+        results[i] = result
+        rows_read += result.rows_read
+        if on_part:
+            on_part(sum(r is not None for r in results), len(tasks), rows_read)
+
+    if workers > 1 and len(tasks) > 1:
+        with tempfile.TemporaryDirectory(prefix='tg-ingest-') as directory, leased_pool(workers) as pool:
+            # Each upload is written out once, however many of its sheets are parsed
+            paths = {}
+            for part in parts:
+                if id(part.source) not in paths:
+                    paths[id(part.source)] = _spool(part.source, directory)
+            futures = {
+                pool.submit(_normalize_part, paths[id(part.source)], *task): i
+                for i, (part, task) in enumerate(zip(parts, tasks))
+            }
+            try:
+                for future in as_completed(futures):
+                    i = futures[future]
+                    try:
+                        finish(i, future.result())
+                    except BrokenProcessPool:
+                        shutdown_pool()
+                        raise
+                    except Exception as e:
+                        raise ValueError(f"{part_label(parts[i])}: {str(e)}") from e
+            finally:
+                for future in futures:
+                    future.cancel()
+    else:
+        payloads = {}
+        for i, (part, task) in enumerate(zip(parts, tasks)):
+            # Sheets of one upload share its bytes
+            if id(part.source) not in payloads:
+                payloads[id(part.source)] = _payload(part.source)
+            try:
+                finish(i, _normalize_part(payloads[id(part.source)], *task))
+            except Exception as e:
+                raise ValueError(f"{part_label(parts[i])}: {str(e)}") from e
+
+    rows_read, normalized = merge_parts(results)
+    metrics.record_parse(rows_read, len(normalized.numbers), time.perf_counter() - started)
+    return rows_read, normalized
+
+
+def read_parts_frame(parts):
+    """Every part's columns stacked into one DataFrame indexed by ``(part, row)``.
+
+    With several parts a leading ``source`` column names the file and sheet
+    each row came from.
+    """
+    frames = [read_frame(part.source, sheet=part.sheet) for part in parts]
+    if not frames:
+        return pd.DataFrame(index=pd.MultiIndex.from_arrays([[], []], names=['part', 'row']))
+    frame = pd.concat(frames, keys=range(len(frames)), names=['part', 'row'])
+    if len(parts) > 1 and 'source' not in frame:
+        labels = np.array([part_label(part) for part in parts], dtype=object)
+        frame.insert(0, 'source', labels[frame.index.get_level_values('part')])
+    return frame
@@ -0,0 +1,87 @@
+"""Columnar store of found users, read back a page at a time
+
+The page used to rebuild one DataFrame from a list of dicts on every rerun.
+Here each journaled batch is appended once as an Arrow record batch, and
+rendering converts only the rows on screen.
+"""
+import pyarrow as pa
+
+from tg_checker.normalize import pack_numbers, unpack_numbers
+
+FOUND_COLUMNS = ['first_name', 'last_name', 'username', 'phone']
+# Phones are stored packed and formatted back to E.164 only when read
+SCHEMA = pa.schema([(column, pa.int64() if column == 'phone' else pa.string()) for column in FOUND_COLUMNS])
+
+PAGE_SIZE = 100
+
+# Rows of the live tail shown while a job runs
+LIVE_TAIL = 10
+
+
+class ResultTable:
+    """Found users of one job, appended incrementally from its journal"""
+
+    def __init__(self, job_id=None):
+        self.job_id = job_id
+        # Byte offset in the journal up to which batches have been read
+        self.offset = 0
+        self.created_at = None
+        self._batches = []
+        self._table = None
+        self._rows = 0
+
+    def __len__(self):
+        return self._rows
+
+    def append(self, records):
+        """Add the found users among lookup ``records``"""
+        users = [r for r in records if r['found']]
+        if users:
+            columns = {column: [user[column] for user in users] for column in FOUND_COLUMNS}
+            columns['phone'] = pack_numbers(columns['phone'])
+            self._batches.append(pa.RecordBatch.from_pydict(columns, schema=SCHEMA))
+            self._rows += len(users)
+            self._table = None
+
+    def sync(self, journal):
+        """Append batches journaled since the last sync; returns how many users were added"""
+        if not journal.exists():
+            return 0
+        if journal.meta['created_at'] != self.created_at:
+            # The job was discarded and started over; read the new journal from the top
+            self.__init__(self.job_id)
+            self.created_at = journal.meta['created_at']
+        before = self._rows
+        batches, self.offset = journal.read_batches(self.offset)
+        for _, records in batches:
+            self.append(records)
+        return self._rows - before
+
+    @property
+    def table(self):
+        if self._table is None:
+            self._table = pa.Table.from_batches(self._batches, schema=SCHEMA)
+        return self._table
+
+    @staticmethod
+    def _formatted(table):
+        phones = unpack_numbers(table.column('phone').to_numpy())
+        return table.set_column(FOUND_COLUMNS.index('phone'), 'phone', phones)
+
+    def page_count(self, size=PAGE_SIZE):
+        return max(1, (self._rows + size - 1) // size)
+
+    def page(self, number, size=PAGE_SIZE):
+        """Rows of 0-based page ``number`` as a DataFrame indexed by row position"""
+        start = number * size
+        frame = self._formatted(self.table.slice(start, size)).to_pandas()
+        frame.index = range(start, start + len(frame))
+        return frame
+
+    def column(self, name):
+        if name == 'phone':
+            return unpack_numbers(self.table.column(name).to_numpy()).to_pylist()
+        return self.table.column(name).to_pylist()
+
+    def to_pandas(self):
+        return self._formatted(self.table).to_pandas()
@@ -0,0 +1,213 @@
+"""Background asyncio runtime that runs lookup jobs off the Streamlit script thread
+
+Streamlit reruns the script on its own thread for every interaction, so the
+Telegram clients and lookup jobs live on one long-lived event loop here. The
+page talks to a job only through thread-safe snapshots and control methods.
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+
+from tg_checker.results import LIVE_TAIL
+
+RUNNING = 'running'
+PAUSED = 'paused'
+DONE = 'done'
+CANCELLED = 'cancelled'
+FAILED = 'failed'
+
+FINAL_STATES = (DONE, CANCELLED, FAILED)
+
+# How many status messages a job keeps for display
+MAX_MESSAGES = 50
+
+# Finished jobs kept for their final status; older ones are dropped as new jobs start
+MAX_FINISHED_JOBS = 20
+
+
+class Runtime:
+    """An event loop running forever on a daemon thread"""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name='tg-checker-runtime', daemon=True)
+        self.thread.start()
+
+    def run(self, coro, timeout=None):
+        """Run ``coro`` on the runtime loop and block until it returns"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def call(self, fn, *args):
+        """Schedule a plain callable on the runtime loop"""
+        self.loop.call_soon_threadsafe(fn, *args)
+
+
+class Job:
+    """A lookup task plus the progress it publishes for the page to poll"""
+
+    def __init__(self, job_id, runtime, owner=None, done_batches=0):
+        self.job_id = job_id
+        self.runtime = runtime
+        # The operator whose Telegram client the job uses
+        self.owner = owner
+        self.task = None
+        self._lock = threading.Lock()
+        self._resume = None
+        self._state = {
+            'state': RUNNING,
+            'status': 'Starting...',
+            # Batches finish out of order when retried, so progress is a count, not the last number
+            'done_batches': done_batches,
+            'total_batches': 0,
+            'found_count': 0,
+            'tail': deque(maxlen=LIVE_TAIL),
+            'messages': [],
+            'stats': {},
+            'started_at': time.time(),
+            'finished_at': None,
+        }
+
+    def _update(self, **changes):
+        with self._lock:
+            self._state.update(changes)
+
+    def _message(self, level, text):
+        with self._lock:
+            messages = self._state['messages'] + [(level, text)]
+            self._state['messages'] = messages[-MAX_MESSAGES:]
+
+    def snapshot(self):
+        """Copy of the job's progress, safe to read from any thread"""
+        with self._lock:
+            state = dict(self._state)
+            state['tail'] = list(state['tail'])
+            state['messages'] = list(state['messages'])
+        return state
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state['state']
+
+    def is_active(self):
+        return self.state not in FINAL_STATES
+
+    # Callbacks handed to find_users; they run on the runtime loop
+
+    def on_batch(self, batch_num, total_batches, records):
+        users = [r for r in records if r['found']]
+        with self._lock:
+            # Only a bounded tail is kept; the full results are read from the journal
+            self._state['found_count'] += len(users)
+            self._state['tail'].extend(users)
+            self._state['done_batches'] += 1
+            self._state['total_batches'] = total_batches
+            self._state['status'] = f"Finished batch {batch_num}/{total_batches}: found {len(users)} users"
+
+    def on_wait(self, remaining):
+        self._update(status=f"Waiting {remaining} seconds before next batch...")
+
+    def on_error(self, batch_num, error):
+        seconds = getattr(error, 'seconds', None)
+        if seconds is not None:
+            self._message('warning', f"Rate limit hit. Waiting {seconds} seconds...")
+        else:
+            self._message('error', f"Error in batch {batch_num}: {error}")
+
+    def on_cleanup(self, batch_num, count):
+        self._update(status=f"Batch {batch_num}: removing {count} imported contacts...")
+
+    def on_stats(self, stats):
+        self._update(stats=stats)
+
+    async def checkpoint(self):
+        """Block while the job is paused"""
+        await self._resume.wait()
+
+    # Controls, callable from the Streamlit thread
+
+    def pause(self):
+        if self.state == RUNNING:
+            self._update(state=PAUSED, status='Paused')
+            self.runtime.call(self._resume.clear)
+
+    def resume(self):
+        if self.state == PAUSED:
+            self._update(state=RUNNING, status='Resuming...')
+            self.runtime.call(self._resume.set)
+
+    def cancel(self):
+        if self.is_active():
+            self.runtime.call(self.task.cancel)
+
+    async def _run(self, make_coro):
+        self._resume = asyncio.Event()
+        self._resume.set()
+        try:
+            # Results are read from the journal, so the job does not hold on to them
+            await make_coro(self)
+            self._update(state=DONE, status='✅ Search completed!')
+        except asyncio.CancelledError:
+            self._update(state=CANCELLED, status='Cancelled')
+        except Exception as e:
+            self._message('error', f"Error during search: {e}")
+            self._update(state=FAILED, status='Failed')
+        finally:
+            with self._lock:
+                self._state['finished_at'] = time.time()
+                self._state['tail'].clear()
+
+
+_runtime = None
+_jobs = {}
+_lock = threading.Lock()
+
+
+def get_runtime():
+    """The process-wide runtime, started on first use"""
+    global _runtime
+    with _lock:
+        if _runtime is None:
+            _runtime = Runtime()
+        return _runtime
+
+
+def get_job(job_id):
+    with _lock:
+        return _jobs.get(job_id)
+
+
+def active_job(owner):
+    """A still-running job of ``owner``, or None"""
+    with _lock:
+        jobs = [job for job in _jobs.values() if job.owner == owner]
+    return next((job for job in jobs if job.is_active()), None)
+
+
+def _evict_finished():
+    """Drop all but the MAX_FINISHED_JOBS most recently finished jobs; call with ``_lock`` held"""
+    finished = sorted((job for job in _jobs.values() if not job.is_active()),
+                      key=lambda job: job.snapshot()['finished_at'] or 0)
+    for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+        del _jobs[job.job_id]
+
+
+def start_job(job_id, make_coro, owner=None, done_batches=0):
+    """Start ``make_coro(job)`` as a task unless a job with this id is still active.
+
+    ``done_batches`` counts batches a resumed job finished in earlier runs.
+    """
+    runtime = get_runtime()
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is not None and job.is_active():
+            return job
+        _evict_finished()
+        job = _jobs[job_id] = Job(job_id, runtime, owner, done_batches)
+
+    async def launch():
+        job.task = asyncio.ensure_future(job._run(make_coro))
+
+    runtime.run(launch())
+    return job
@@ -0,0 +1,129 @@
+"""Batch scheduling that honors flood waits and retries failed batches"""
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+
+from tg_checker import metrics
+
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 5
+BACKOFF_CAP = 300
+
+
+class BatchScheduler:
+    """Hands out batches no faster than ``interval`` seconds apart.
+
+    ``interval`` is measured from the start of one batch to the start of the
+    next, so time spent on the request itself counts toward it. A flood wait
+    holds every batch back for exactly the number of seconds the server asked
+    for and then retries the same batch first. Other failures go to a retry
+    queue with exponential backoff and are dropped after ``max_attempts``.
+    """
+
+    def __init__(self, interval=0, max_attempts=MAX_ATTEMPTS, backoff_base=BACKOFF_BASE, backoff_cap=BACKOFF_CAP,
+                 clock=time.monotonic, sleep=asyncio.sleep):
+        self.interval = interval
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.clock = clock
+        self.sleep = sleep
+        self.failed = []
+        self.stats = {
+            'work_seconds': 0.0, 'pacing_seconds': 0.0, 'flood_wait_seconds': 0.0, 'backoff_seconds': 0.0,
+            'paused_seconds': 0.0, 'cleanup_seconds': 0.0, 'batches': 0, 'flood_waits': 0, 'retries': 0,
+            'failed_batches': 0, 'contacts_deleted': 0,
+        }
+        self._queue = deque()
+        self._retries = []
+        self._order = itertools.count()
+        self._attempts = {}
+        self._last_start = None
+        self._flood_until = 0.0
+        self._started = None
+
+    def add(self, batch_num, batch):
+        self._queue.append((batch_num, batch))
+
+    def __len__(self):
+        return len(self._queue) + len(self._retries)
+
+    def _finish_work(self):
+        if self._started is not None:
+            self.stats['work_seconds'] += self.clock() - self._started
+            self._started = None
+
+    def done(self, batch_num):
+        """Mark the batch handed out last as finished"""
+        self._finish_work()
+        self.stats['batches'] += 1
+        self._attempts.pop(batch_num, None)
+
+    def flood_wait(self, batch_num, batch, seconds):
+        """The server asked us to wait ``seconds``; retry this batch right after"""
+        self._finish_work()
+        self.stats['flood_waits'] += 1
+        self._flood_until = max(self._flood_until, self.clock() + seconds)
+        self._queue.appendleft((batch_num, batch))
+
+    def retry(self, batch_num, batch):
+        """Requeue a failed batch with backoff; returns False once it is given up"""
+        self._finish_work()
+        attempts = self._attempts[batch_num] = self._attempts.get(batch_num, 0) + 1
+        if attempts >= self.max_attempts:
+            self._attempts.pop(batch_num)
+            self.failed.append(batch_num)
+            self.stats['failed_batches'] += 1
+            return False
+        self.stats['retries'] += 1
+        delay = min(self.backoff_base * 2 ** (attempts - 1), self.backoff_cap)
+        heapq.heappush(self._retries, (self.clock() + delay, next(self._order), batch_num, batch))
+        return True
+
+    def requeue(self, batch_num, new_batch_num, batch):
+        """Queue part of batch ``batch_num`` again as ``new_batch_num``, with backoff.
+
+        It counts as another attempt of the original batch, so numbers the
+        server keeps deferring are given up after ``max_attempts`` too.
+        """
+        self._attempts[new_batch_num] = self._attempts.get(batch_num, 0)
+        return self.retry(new_batch_num, batch)
+
+    def _next(self, now):
+        """``(ready_at, wait reason, pop)`` for the batch that should run next"""
+        pacing_until = self._last_start + self.interval if self._last_start is not None else 0.0
+        gate = max(self._flood_until, pacing_until)
+        reason = 'flood_wait_seconds' if self._flood_until > pacing_until else 'pacing_seconds'
+        if self._retries and (not self._queue or self._retries[0][0] <= max(now, gate)):
+            retry_at = self._retries[0][0]
+            if retry_at > gate:
+                gate, reason = retry_at, 'backoff_seconds'
+            return gate, reason, lambda: heapq.heappop(self._retries)[2:]
+        return gate, reason, self._queue.popleft
+
+    async def next_batch(self, on_wait=None, checkpoint=None):
+        """Wait until the next batch may run and return ``(batch_num, batch)``, or None when empty.
+
+        ``on_wait(seconds_left)`` is called about once a second while waiting
+        and ``checkpoint()`` is awaited so a paused job stays paused.
+        """
+        while len(self):
+            if checkpoint:
+                paused_at = self.clock()
+                await checkpoint()
+                self.stats['paused_seconds'] += self.clock() - paused_at
+            now = self.clock()
+            ready_at, reason, pop = self._next(now)
+            if ready_at <= now:
+                self._last_start = self._started = now
+                return pop()
+            step = min(1.0, ready_at - now)
+            if on_wait:
+                on_wait(int(ready_at - now + 0.999))
+            await self.sleep(step)
+            waited = self.clock() - now
+            self.stats[reason] += waited
+            metrics.record_wait(reason[:-len('_seconds')], waited)
+        return None
@@ -0,0 +1,243 @@
+"""One persisted Telegram session and one connected client per operator phone
+
+Sessions live in SESSION_DIR, named after the phone's digits, so a restart
+or redeploy reconnects with the stored authorization instead of asking for a
+new code. Next to each session a salted hash of the API ID and hash it was
+authorized with is kept, and the session is only reused with those same
+credentials; anyone else who enters the phone has to log in with a code.
+Connected clients are kept for the life of the process and shared by every
+rerun and browser session that presents the same phone and credentials.
+"""
+import hashlib
+import hmac
+import json
+import os
+import re
+import threading
+import time
+import weakref
+
+from telethon import TelegramClient
+from telethon.sessions import SQLiteSession, StringSession
+
+from tg_checker import runner
+from tg_checker.settings import SESSION_BACKEND, SESSION_DIR, SESSION_MAX_AGE_DAYS
+
+# File suffix of each session backend
+SUFFIXES = {'file': '.session', 'string': '.string'}
+
+# The credentials a session was authorized with, as a salted PBKDF2 hash
+AUTH_SUFFIX = '.auth'
+HASH_ITERATIONS = 100_000
+
+# Session key -> (shared client, its "api_id:api_hash"); only clients of a verified session
+_clients = {}
+# Clients on a fresh, empty session that are not bound to the stored one until they log in
+_unbound = weakref.WeakSet()
+_lock = threading.Lock()
+_cleaned = False
+
+
+def session_key(phone):
+    """Digits of the operator phone, used to name its session"""
+    digits = re.sub(r'\D', '', phone or '')
+    if not digits:
+        raise ValueError("A phone number is needed to store a session")
+    return digits
+
+
+def session_path(phone, backend=SESSION_BACKEND):
+    return os.path.join(SESSION_DIR, session_key(phone) + SUFFIXES[backend])
+
+
+def has_session(phone, backend=SESSION_BACKEND):
+    return os.path.exists(session_path(phone, backend))
+
+
+def _auth_path(phone):
+    return os.path.join(SESSION_DIR, session_key(phone) + AUTH_SUFFIX)
+
+
+def _credentials(api_id, api_hash):
+    return f"{api_id}:{api_hash}"
+
+
+def _credentials_hash(api_id, api_hash, salt):
+    return hashlib.pbkdf2_hmac('sha256', _credentials(api_id, api_hash).encode(), salt, HASH_ITERATIONS).hex()
+
+
+def credentials_match(phone, api_id, api_hash, backend=SESSION_BACKEND):
+    """Whether the stored session for ``phone`` was authorized with these API credentials"""
+    path = _auth_path(phone)
+    if not (has_session(phone, backend) and os.path.exists(path)):
+        return False
+    try:
+        with open(path, encoding='utf-8') as f:
+            stored = json.load(f)
+        expected = _credentials_hash(api_id, api_hash, bytes.fromhex(stored['salt']))
+    except (OSError, ValueError, KeyError):
+        return False
+    return hmac.compare_digest(expected, stored['hash'])
+
+
+def _write_private(path, data):
+    """Replace ``path`` with ``data``, readable by this user only"""
+    tmp = path + '.tmp'
+    with open(os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w', encoding='utf-8') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _bind(phone, api_id, api_hash):
+    salt = os.urandom(16)
+    _write_private(_auth_path(phone), json.dumps({'salt': salt.hex(), 'hash': _credentials_hash(api_id, api_hash, salt)}))
+
+
+def _store_session(phone, session, backend):
+    """Write a logged-in client's in-memory session as the stored session for ``phone``"""
+    os.makedirs(SESSION_DIR, exist_ok=True)
+    path = session_path(phone, backend)
+    if backend == 'string':
+        _write_private(path, session.save())
+        return
+    base = path[:-len(SUFFIXES['file'])] + '.tmp'
+    stored = SQLiteSession(base)
+    try:
+        stored.set_dc(session.dc_id, session.server_address, session.port)
+        stored.auth_key = session.auth_key
+        stored.save()
+    finally:
+        stored.close()
+    os.chmod(base + SUFFIXES['file'], 0o600)
+    if os.path.exists(path + '-journal'):
+        os.remove(path + '-journal')
+    os.replace(base + SUFFIXES['file'], path)
+
+
+def _session(phone, backend):
+    os.makedirs(SESSION_DIR, exist_ok=True)
+    path = session_path(phone, backend)
+    if backend == 'string':
+        text = ''
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                text = f.read().strip()
+        return StringSession(text)
+    # Telethon adds the .session suffix itself
+    return path[:-len(SUFFIXES['file'])]
+
+
+def get_client(phone, api_id, api_hash, backend=SESSION_BACKEND, client_class=None):
+    """A client for ``phone``: the shared one when the credentials match the stored session.
+
+    With other credentials, or no stored session, the client starts on an
+    empty session that has to log in with a code, and is neither shared nor
+    stored until ``save`` is called after the login. A client someone else
+    is using is never disconnected here. Clients are built on the runtime
+    loop they will run on.
+    """
+    _cleanup_once()
+    key = session_key(phone)
+    with _lock:
+        entry = _clients.get(key)
+    if entry is not None and hmac.compare_digest(entry[1], _credentials(api_id, api_hash)):
+        return entry[0]
+
+    verified = credentials_match(phone, api_id, api_hash, backend)
+
+    async def create():
+        session = _session(phone, backend) if verified else StringSession()
+        # Telethon would sleep through short flood waits itself; BatchScheduler must see every one
+        return (client_class or TelegramClient)(session, api_id, api_hash, flood_sleep_threshold=0)
+
+    client = runner.get_runtime().run(create())
+    if not verified:
+        _unbound.add(client)
+        return client
+    with _lock:
+        # Another rerun may have connected the same operator meanwhile
+        entry = _clients.setdefault(key, (client, _credentials(api_id, api_hash)))
+    return entry[0]
+
+
+async def _disconnect(client):
+    # Telethon's disconnect() only returns an awaitable when called on a running loop
+    await client.disconnect()
+
+
+async def connect(client):
+    """Connect unless already connected; returns whether the stored session is authorized"""
+    if not client.is_connected():
+        await client.connect()
+    return await client.is_user_authorized()
+
+
+def save(phone, client, api_id, api_hash, backend=SESSION_BACKEND):
+    """Persist the client's authorization and mark the session as used.
+
+    A client that has just logged in on a fresh session replaces the stored
+    session, which is bound to ``api_id`` and ``api_hash`` from then on, and
+    becomes the shared client for those credentials.
+    """
+    key = session_key(phone)
+    if client in _unbound:
+        _store_session(phone, client.session, backend)
+        _bind(phone, api_id, api_hash)
+        _unbound.discard(client)
+        with _lock:
+            # Whoever held the old session keeps their client; it is just no longer handed out
+            _clients[key] = (client, _credentials(api_id, api_hash))
+    elif backend == 'string':
+        _write_private(session_path(phone, backend), client.session.save())
+    for path in (session_path(phone, backend), _auth_path(phone)):
+        if os.path.exists(path):
+            os.utime(path)
+
+
+def release(phone, client):
+    """Disconnect ``client`` and stop sharing it, keeping the stored session.
+
+    Other browser sessions may still hold the client; a job reconnects it
+    with ``connect`` before it starts.
+    """
+    with _lock:
+        if _clients.get(session_key(phone), (None,))[0] is client:
+            del _clients[session_key(phone)]
+    _unbound.discard(client)
+    runner.get_runtime().run(_disconnect(client))
+
+
+def forget(phone, client):
+    """Disconnect ``client`` and delete the stored session, so the next start logs in again"""
+    release(phone, client)
+    for path in [session_path(phone, backend) for backend in SUFFIXES] + [_auth_path(phone)]:
+        for name in (path, path + '-journal'):
+            if os.path.exists(name):
+                os.remove(name)
+
+
+def cleanup_stale(max_age_days=SESSION_MAX_AGE_DAYS):
+    """Delete session files not used for ``max_age_days``; returns the removed names"""
+    if not os.path.isdir(SESSION_DIR):
+        return []
+    cutoff = time.time() - max_age_days * 86400
+    with _lock:
+        in_use = set(_clients)
+    removed = []
+    for name in os.listdir(SESSION_DIR):
+        path = os.path.join(SESSION_DIR, name)
+        if name.split('.', 1)[0] in in_use or not os.path.isfile(path):
+            continue
+        if os.path.getmtime(path) < cutoff:
+            os.remove(path)
+            removed.append(name)
+    return removed
+
+
+def _cleanup_once():
+    global _cleaned
+    with _lock:
+        if _cleaned:
+            return
+        _cleaned = True
+    cleanup_stale()
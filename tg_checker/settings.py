@@ -0,0 +1,74 @@
+"""Environment-driven settings shared by the pipeline modules"""
+import os
+
+# Where result stores, job journals and sessions are kept
+DATA_DIR = os.environ.get('TG_DATA_DIR', 'data')
+
+# Upper bound for the in-process upload cache
+CACHE_MB = int(os.environ.get('TG_CACHE_MB', '128'))
+
+# How long a lookup result is trusted before the number is checked again
+RESULT_TTL_DAYS = float(os.environ.get('TG_RESULT_TTL_DAYS', '30'))
+
+# Telegram sessions: 'file' keeps Telethon's SQLite session, 'string' a StringSession text file
+SESSION_DIR = os.environ.get('TG_SESSION_DIR') or os.path.join(DATA_DIR, 'sessions')
+SESSION_BACKEND = os.environ.get('TG_SESSION_BACKEND', 'file')
+
+# Session files not used for this long are deleted
+SESSION_MAX_AGE_DAYS = float(os.environ.get('TG_SESSION_MAX_AGE_DAYS', '30'))
+
+# Job journals not written to for this long are deleted
+JOB_MAX_AGE_DAYS = float(os.environ.get('TG_JOB_MAX_AGE_DAYS', '7'))
+
+# JSON metrics log: 'default' for data/metrics.jsonl, '-' for stderr, a path, or empty to turn it off
+METRICS_LOG = os.environ.get('TG_METRICS_LOG', 'default')
+
+# Local port for the Prometheus /metrics endpoint; 0 turns it off
+METRICS_PORT = int(os.environ.get('TG_METRICS_PORT', '9108'))
+
+# Default cap on parse workers; each one holds its own pandas import and parse buffers (~125 MB)
+MAX_DEFAULT_WORKERS = 2
+
+
+def _cgroup_cpus():
+    """CPU limit of the container's cgroup (v2 or v1), or None when unlimited"""
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()[:2]
+        return None if quota == 'max' else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as f:
+            quota = int(f.read())
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as f:
+            period = int(f.read())
+        return None if quota <= 0 else quota / period
+    except (OSError, ValueError):
+        return None
+
+
+def available_cpus():
+    """CPUs this process may actually use: its affinity mask, within any cgroup quota"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    limit = _cgroup_cpus()
+    if limit is not None:
+        cpus = min(cpus, max(1, int(limit)))
+    return cpus
+
+
+# Worker processes that parse uploaded files and sheets in parallel; 1 parses in-process
+INGEST_WORKERS = int(os.environ.get('TG_INGEST_WORKERS') or min(available_cpus(), MAX_DEFAULT_WORKERS))
+
+# Idle workers are stopped after this many seconds without a parse; 0 stops them after every parse
+INGEST_IDLE_SECONDS = float(os.environ.get('TG_INGEST_IDLE_SECONDS', '60'))
+
+
+def data_path(*parts):
+    """Path under DATA_DIR, creating the parent directory"""
+    path = os.path.join(DATA_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
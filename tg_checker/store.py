@@ -0,0 +1,114 @@
+"""SQLite store of lookup results so checked numbers are not queried again"""
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+from tg_checker.settings import RESULT_TTL_DAYS, data_path
+
+FIELDS = ('phone', 'found', 'user_id', 'first_name', 'last_name', 'username', 'checked_at')
+
+# SQLite limits the number of bound parameters per statement
+_QUERY_CHUNK = 500
+
+
+class ResultStore:
+    """Lookup results keyed by normalized E.164 number, expiring after ``ttl_days``"""
+
+    def __init__(self, path=None, ttl_days=RESULT_TTL_DAYS):
+        self.path = path or data_path('results.sqlite3')
+        self.ttl_days = ttl_days
+        with closing(self._connect()) as conn, conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS results ('
+                'phone TEXT PRIMARY KEY, found INTEGER NOT NULL, user_id INTEGER, '
+                'first_name TEXT, last_name TEXT, username TEXT, checked_at REAL NOT NULL)'
+            )
+
+    def _connect(self):
+        # A connection per call keeps the store safe to use from any thread
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _cutoff(self):
+        return time.time() - self.ttl_days * 86400
+
+    def get_many(self, numbers):
+        """Fresh records for ``numbers`` as a dict keyed by phone"""
+        numbers = list(numbers)
+        cutoff = self._cutoff()
+        records = {}
+        with closing(self._connect()) as conn:
+            for start in range(0, len(numbers), _QUERY_CHUNK):
+                chunk = numbers[start:start + _QUERY_CHUNK]
+                placeholders = ','.join('?' * len(chunk))
+                rows = conn.execute(
+                    f'SELECT * FROM results WHERE checked_at >= ? AND phone IN ({placeholders})',
+                    [cutoff, *chunk]
+                )
+                for row in rows:
+                    record = dict(row)
+                    record['found'] = bool(record['found'])
+                    records[record['phone']] = record
+        return records
+
+    def count_fresh(self, numbers):
+        """How many of ``numbers`` have a fresh record, without loading the records"""
+        numbers = list(numbers)
+        cutoff = self._cutoff()
+        count = 0
+        with closing(self._connect()) as conn:
+            for start in range(0, len(numbers), _QUERY_CHUNK):
+                chunk = numbers[start:start + _QUERY_CHUNK]
+                placeholders = ','.join('?' * len(chunk))
+                count += conn.execute(
+                    f'SELECT COUNT(*) FROM results WHERE checked_at >= ? AND phone IN ({placeholders})',
+                    [cutoff, *chunk]
+                ).fetchone()[0]
+        return count
+
+    def partition(self, numbers):
+        """Split ``numbers`` into ``(cached records, uncached numbers)``, keeping order"""
+        cached = self.get_many(numbers)
+        return cached, [n for n in numbers if n not in cached]
+
+    def put_many(self, records):
+        """Insert or refresh lookup records"""
+        now = time.time()
+        rows = [
+            (r['phone'], int(r['found']), r.get('user_id'), r.get('first_name', ''),
+             r.get('last_name', ''), r.get('username', ''), r.get('checked_at') or now)
+            for r in records
+        ]
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(f'INSERT OR REPLACE INTO results VALUES ({",".join("?" * len(FIELDS))})', rows)
+
+    def purge_expired(self, ttl_days=None):
+        """Delete records older than ``ttl_days`` (the store's TTL by default); returns how many were removed"""
+        cutoff = self._cutoff() if ttl_days is None else time.time() - ttl_days * 86400
+        with closing(self._connect()) as conn, conn:
+            return conn.execute('DELETE FROM results WHERE checked_at < ?', [cutoff]).rowcount
+
+
+_stores = {}
+_purged = False
+_lock = threading.Lock()
+
+
+def get_store(ttl_days=RESULT_TTL_DAYS):
+    """The process-wide store for ``ttl_days``, opened (and its table created) on first use.
+
+    The first store opened also purges records older than RESULT_TTL_DAYS
+    (or ``ttl_days`` when longer), once per process.
+    """
+    global _purged
+    with _lock:
+        store = _stores.get(ttl_days)
+        if store is None:
+            store = _stores[ttl_days] = ResultStore(ttl_days=ttl_days)
+        if not _purged:
+            _purged = True
+            store.purge_expired(max(ttl_days, RESULT_TTL_DAYS))
+        return store